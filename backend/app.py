@@ -1,15 +1,23 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, flash, stream_with_context
 from flask_cors import CORS
-from models import db, User, Ticket, Match, ChatConversation, ChatMessage
+from models import db, User, Ticket, Match, ChatConversation, ChatMessage, TICKET_ROW_COLUMNS, ticket_row_to_dict, utcnow, check_password_for_missing_user
 from datetime import datetime, date
 import re
 import os
+import json
 import secrets
 import csv
+import hashlib
 import sys
+import time
 import logging
+from functools import wraps
+import orjson
+from flask.json.provider import DefaultJSONProvider
 from llm_service import LLMService
 from jwt_utils import generate_token, get_user_from_token
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import undefer
 
 # Configure logging to ensure all messages are captured in Railway
 logging.basicConfig(
@@ -23,8 +31,34 @@ logger = logging.getLogger(__name__)
 # FIFA 2026 World Cup date range
 FIFA_MIN_DATE = date(2026, 6, 11)
 FIFA_MAX_DATE = date(2026, 7, 19)
+_FIFA_DATE_RANGE_ERROR = f'Date must be between {FIFA_MIN_DATE.strftime("%B %d, %Y")} and {FIFA_MAX_DATE.strftime("%B %d, %Y")} (FIFA 2026 World Cup period)'
+
+# Page sizes for keyset-paginated ticket listing
+TICKETS_PAGE_SIZE = 50
+MAX_TICKETS_PAGE_SIZE = 200
+
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider with compact responses encoded by orjson
+
+    Keys stay sorted and dates still go through Flask's default (HTTP date format), so
+    responses match the stock provider; debug/pretty output is left to the stock path.
+    """
+    _OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self._OPTIONS | orjson.OPT_APPEND_NEWLINE),
+            mimetype=self.mimetype,
+        )
+
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 
 # Production configuration
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', secrets.token_hex(32))
@@ -35,7 +69,24 @@ if database_url:
     # Fix postgres:// to postgresql:// (Railway/Heroku compatibility)
     if database_url.startswith('postgres://'):
         database_url = database_url.replace('postgres://', 'postgresql://', 1)
+    # Pin the psycopg2 driver we ship (newer SQLAlchemy defaults postgresql:// to psycopg 3)
+    if database_url.startswith('postgresql://'):
+        database_url = database_url.replace('postgresql://', 'postgresql+psycopg2://', 1)
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    # Size the pool per worker process: workers x pool_size must stay under Postgres max_connections
+    engine_options = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 5)),
+        'pool_pre_ping': True,
+    }
+    if database_url.startswith('postgresql+psycopg2://'):
+        # Rewrite executemany() into batched multi-row statements instead of one round trip per row
+        engine_options.update({
+            'executemany_mode': 'values_plus_batch',
+            'insertmanyvalues_page_size': 500,
+            'executemany_batch_page_size': 200,
+        })
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
     logger.info("Using PostgreSQL database")
 else:
     # Default to SQLite for local development
@@ -79,37 +130,24 @@ CORS(app,
      methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS']
 )
 
-def login_required(f):
-    """Decorator to require JWT authentication for protected routes"""
+def login_required_api(f):
+    """Decorator to require JWT authentication for protected API routes (JSON 401 on failure)"""
+    @wraps(f)
     def decorated_function(*args, **kwargs):
         user_data = get_user_from_token()
         
         if not user_data:
-            # Check if this is an API route
-            if request.path.startswith('/api/'):
-                return jsonify({'error': 'Authentication required'}), 401
-            else:
-                return redirect(url_for('login'))
+            return jsonify({'error': 'Authentication required'}), 401
         
         # Add user_id to kwargs so endpoints can access it
         kwargs['user_id'] = user_data['user_id']
         return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
     return decorated_function
 
 @app.route('/')
 def index():
     return redirect(url_for('login'))
 
-@app.route('/ping')
-def ping():
-    """Simple ping endpoint for Railway health checks"""
-    return jsonify({
-        'status': 'ok',
-        'message': 'FIFA 2026 Ticket App is running',
-        'timestamp': datetime.now().isoformat()
-    }), 200
-
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     # This route is for server-side rendering (if needed)
@@ -139,8 +177,15 @@ def api_login():
         return jsonify({'error': 'Username and password required'}), 400
     
     user = User.query.filter_by(username=username).first()
+    if user is None:
+        check_password_for_missing_user(password)
     
     if user and user.check_password(password):
+        # Upgrade legacy (slow pbkdf2) hashes while the plaintext is at hand
+        if user.password_needs_rehash():
+            user.set_password(password)
+            db.session.commit()
+        
         # Generate JWT token
         token = generate_token(user.id, user.username)
         
@@ -192,16 +237,26 @@ def api_register():
     }), 201
 
 @app.route('/api/auth/me', methods=['GET'])
-@login_required
+@login_required_api
 def get_current_user(user_id):
     """Get current authenticated user"""
-    user = User.query.get(user_id)
+    user = db.session.get(User, user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
-    return jsonify({
-        'id': user.id,
-        'username': user.username
-    })
+    
+    # The body is just id + username (usernames can't change), so they fingerprint it;
+    # clients re-checking on page load get a 304 without re-serializing
+    etag = hashlib.sha256(f'{user.id}:{user.username}'.encode('utf-8')).hexdigest()[:16]
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify({
+            'id': user.id,
+            'username': user.username
+        })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, max-age=5, must-revalidate'
+    return response
 
 @app.route('/api/debug/session', methods=['GET'])
 def debug_session():
@@ -222,98 +277,120 @@ def dashboard():
     return redirect(url_for('index'))
 
 
+# Liveness body never changes - build it once
+_LIVE_BODY = json.dumps({'status': 'ok', 'service': 'FIFA 2026 Ticket App'}).encode()
+
+# Readiness result is reused for a few seconds so frequent probes don't hammer the DB
+READY_CACHE_SECONDS = 5
+_ready_cache = {'checked_at': 0.0, 'body': None, 'status': 503}
+
+@app.route('/live')
 @app.route('/health')
-def health_check():
-    """Health check endpoint for Railway and monitoring"""
-    try:
-        # Test database connection
-        from sqlalchemy import text
-        db.session.execute(text('SELECT 1'))
-        database_status = 'connected'
-    except Exception as e:
-        database_status = f'error: {str(e)}'
-    
-    # Always return 200 for basic health check
-    # Railway just needs to know the app is responding
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
-        'service': 'FIFA 2026 Ticket App',
-        'version': '1.0.0',
-        'database': database_status,
-        'port': os.environ.get('PORT', 'not_set'),
-        'environment': os.environ.get('FLASK_ENV', 'not_set')
-    }), 200
+@app.route('/ping')
+def liveness_check():
+    """Liveness probe for Railway/Docker - no dependencies, just proves the process responds"""
+    return Response(_LIVE_BODY, mimetype='application/json')
 
+@app.route('/ready')
 @app.route('/health/detailed')
-def detailed_health_check():
-    """Detailed health check with database connectivity test"""
-    try:
-        # Test database connection
-        from sqlalchemy import text
-        db.session.execute(text('SELECT 1'))
-        
-        return jsonify({
-            'status': 'healthy',
+def readiness_check():
+    """Readiness probe with database connectivity test (cached for READY_CACHE_SECONDS)"""
+    now = time.monotonic()
+    if _ready_cache['body'] is None or now - _ready_cache['checked_at'] >= READY_CACHE_SECONDS:
+        body = {
             'timestamp': datetime.now().isoformat(),
             'service': 'FIFA 2026 Ticket App',
             'version': '1.0.0',
-            'database': 'connected',
-            'port': os.environ.get('PORT', 'not_set'),
-            'environment': os.environ.get('FLASK_ENV', 'not_set')
-        }), 200
-    except Exception as e:
-        return jsonify({
-            'status': 'unhealthy',
-            'timestamp': datetime.now().isoformat(),
-            'service': 'FIFA 2026 Ticket App',
-            'error': str(e),
-            'database': 'disconnected',
             'port': os.environ.get('PORT', 'not_set'),
             'environment': os.environ.get('FLASK_ENV', 'not_set')
-        }), 503
+        }
+        try:
+            # Test database connection
+            from sqlalchemy import text
+            db.session.execute(text('SELECT 1'))
+            body.update({'status': 'healthy', 'database': 'connected'})
+            status = 200
+        except Exception as e:
+            body.update({'status': 'unhealthy', 'database': 'disconnected', 'error': str(e)})
+            status = 503
+        _ready_cache.update({'checked_at': now, 'body': body, 'status': status})
+    
+    return jsonify(_ready_cache['body']), _ready_cache['status']
+
+def tickets_etag():
+    """Build an ETag for the ticket list from its row count and latest update"""
+    count, max_id, last_updated = db.session.query(
+        func.count(Ticket.id), func.max(Ticket.id), func.max(Ticket.updated_at)
+    ).one()
+    return hashlib.md5(f'{count}:{max_id}:{last_updated}'.encode()).hexdigest()
+
+def matches_etag():
+    """Build an ETag for the match schedule from its row count and latest update"""
+    count, max_id, last_updated = db.session.query(
+        func.count(Match.id), func.max(Match.id), func.max(Match.updated_at)
+    ).one()
+    return hashlib.md5(f'matches:{count}:{max_id}:{last_updated}'.encode()).hexdigest()
 
 @app.route('/api/tickets', methods=['GET'])
-@login_required
+@login_required_api
 def get_tickets(user_id):
     """Get all tickets (all users can see all tickets)"""
+    # Opt-in keyset pagination: ?limit=50&cursor=<date>_<id>
+    if 'limit' in request.args or 'cursor' in request.args:
+        return get_tickets_page(user_id)
+    
     try:
-        tickets = Ticket.query.order_by(Ticket.date.desc()).all()
+        # Cheap fingerprint of the ticket table - lets unchanged dashboards get a 304
+        etag = tickets_etag()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        
+        # Plain column rows - no ORM objects or identity map for the whole table
+        tickets = db.session.query(*TICKET_ROW_COLUMNS).outerjoin(
+            User, Ticket.user_id == User.id
+        ).order_by(Ticket.date.desc()).all()
         logger.info(f"Retrieved {len(tickets)} tickets for user {user_id}")
-        ticket_dicts = []
-        for ticket in tickets:
-            try:
-                ticket_dicts.append(ticket.to_dict())
-            except Exception as e:
-                logger.error(f"Error serializing ticket {ticket.id}: {e}")
-                # Include ticket even if serialization fails for some fields
-                ticket_dict = {
-                    'id': ticket.id,
-                    'user_id': ticket.user_id,
-                    'username': ticket.user.username if ticket.user else 'Unknown',
-                    'name': ticket.name,
-                    'match_number': ticket.match_number,
-                    'date': ticket.date.strftime('%Y-%m-%d') if ticket.date else None,
-                    'venue': ticket.venue,
-                    'teams': getattr(ticket, 'teams', None),
-                    'match_type': getattr(ticket, 'match_type', None),
-                    'ticket_category': ticket.ticket_category,
-                    'quantity': ticket.quantity,
-                    'ticket_info': ticket.ticket_info,
-                    'ticket_price': ticket.ticket_price,
-                    'created_at': ticket.created_at.strftime('%Y-%m-%d %H:%M') if ticket.created_at else None,
-                    'updated_at': ticket.updated_at.strftime('%Y-%m-%d %H:%M') if ticket.updated_at else None
-                }
-                ticket_dicts.append(ticket_dict)
-        return jsonify(ticket_dicts)
+        ticket_dicts = [ticket_row_to_dict(row) for row in tickets]
+        response = jsonify(ticket_dicts)
+        response.set_etag(etag)
+        return response
     except Exception as e:
         logger.error(f"Error getting tickets: {e}")
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
         return jsonify({'error': 'Failed to retrieve tickets'}), 500
 
+def get_tickets_page(user_id):
+    """Return one page of tickets ordered by (date, id) descending"""
+    limit = request.args.get('limit', TICKETS_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_TICKETS_PAGE_SIZE))
+    
+    query = db.session.query(*TICKET_ROW_COLUMNS).outerjoin(User, Ticket.user_id == User.id)
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_date, cursor_id = cursor.split('_')
+            query = query.filter(
+                tuple_(Ticket.date, Ticket.id) < (date.fromisoformat(cursor_date), int(cursor_id))
+            )
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    
+    tickets = query.order_by(Ticket.date.desc(), Ticket.id.desc()).limit(limit).all()
+    logger.info(f"Retrieved page of {len(tickets)} tickets for user {user_id}")
+    
+    # A page is bounded by MAX_TICKETS_PAGE_SIZE, so it is serialized in one go by the app's JSON provider
+    response = jsonify([ticket_row_to_dict(row) for row in tickets])
+    # Full page means there may be more - hand back the cursor for the next request
+    if len(tickets) == limit:
+        last = tickets[-1]
+        response.headers['X-Next-Cursor'] = f'{last.date.isoformat()}_{last.id}'
+    return response
+
 @app.route('/api/tickets', methods=['POST'])
-@login_required
+@login_required_api
 def create_ticket(user_id):
     """Create a new ticket"""
     data = request.get_json()
@@ -329,6 +406,9 @@ def create_ticket(user_id):
     if not match:
         return jsonify({'error': 'Invalid match number. Please select from the dropdown.'}), 400
     
+    if not isinstance(data['date'], str):
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
     # Validate date format - parse explicitly to avoid timezone issues
     try:
         date_parts = data['date'].split('-')
@@ -340,7 +420,7 @@ def create_ticket(user_id):
     
     # Validate date is within FIFA 2026 World Cup period
     if not (FIFA_MIN_DATE <= date_obj <= FIFA_MAX_DATE):
-        return jsonify({'error': f'Date must be between {FIFA_MIN_DATE.strftime("%B %d, %Y")} and {FIFA_MAX_DATE.strftime("%B %d, %Y")} (FIFA 2026 World Cup period)'}), 400
+        return jsonify({'error': _FIFA_DATE_RANGE_ERROR}), 400
     
     # Validate quantity
     try:
@@ -381,7 +461,7 @@ def create_ticket(user_id):
     return jsonify(ticket.to_dict()), 201
 
 @app.route('/api/tickets/<int:ticket_id>', methods=['PUT'])
-@login_required
+@login_required_api
 def update_ticket(ticket_id, user_id):
     """Update an existing ticket"""
     ticket = Ticket.query.filter_by(id=ticket_id, user_id=user_id).first()
@@ -402,6 +482,9 @@ def update_ticket(ticket_id, user_id):
     if not match:
         return jsonify({'error': 'Invalid match number. Please select from the dropdown.'}), 400
     
+    if not isinstance(data['date'], str):
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
     # Validate date format - parse explicitly to avoid timezone issues
     try:
         date_parts = data['date'].split('-')
@@ -413,7 +496,7 @@ def update_ticket(ticket_id, user_id):
     
     # Validate date is within FIFA 2026 World Cup period
     if not (FIFA_MIN_DATE <= date_obj <= FIFA_MAX_DATE):
-        return jsonify({'error': f'Date must be between {FIFA_MIN_DATE.strftime("%B %d, %Y")} and {FIFA_MAX_DATE.strftime("%B %d, %Y")} (FIFA 2026 World Cup period)'}), 400
+        return jsonify({'error': _FIFA_DATE_RANGE_ERROR}), 400
     
     # Validate quantity
     try:
@@ -450,7 +533,7 @@ def update_ticket(ticket_id, user_id):
     return jsonify(ticket.to_dict())
 
 @app.route('/api/tickets/<int:ticket_id>', methods=['DELETE'])
-@login_required
+@login_required_api
 def delete_ticket(ticket_id, user_id):
     """Delete a ticket"""
     ticket = Ticket.query.filter_by(id=ticket_id, user_id=user_id).first()
@@ -498,8 +581,7 @@ def init_match_data():
                 for row in reader:
                     match_number = row['match_number'].strip()
                     # Parse date explicitly to avoid timezone issues
-                    date_parts = row['date'].split('-')
-                    date_obj = datetime(int(date_parts[0]), int(date_parts[1]), int(date_parts[2])).date()
+                    date_obj = date.fromisoformat(row['date'].strip())
                     schedule_data[match_number] = {
                         'date': date_obj,
                         'venue': row['venue'].strip()
@@ -542,7 +624,8 @@ def init_match_data():
                     db.session.execute(
                         text("""
                             UPDATE match 
-                            SET date = :date, venue = :venue, teams = :teams, match_type = :match_type 
+                            SET date = :date, venue = :venue, teams = :teams, match_type = :match_type,
+                                updated_at = :updated_at
                             WHERE match_number = :match_number
                         """),
                         {
@@ -550,6 +633,7 @@ def init_match_data():
                             'venue': schedule_info['venue'],
                             'teams': games_info['teams'],
                             'match_type': games_info['match_type'],
+                            'updated_at': utcnow(),
                             'match_number': match_number
                         }
                     )
@@ -588,7 +672,7 @@ def init_match_data():
         logger.error(f"Traceback: {traceback.format_exc()}")
 
 def ensure_match_columns_exist():
-    """Ensure teams and match_type columns exist in the match table"""
+    """Ensure teams, match_type and updated_at columns exist in the match table"""
     try:
         from sqlalchemy import inspect, text
         inspector = inspect(db.engine)
@@ -602,7 +686,7 @@ def ensure_match_columns_exist():
         columns = [col['name'] for col in inspector.get_columns('match')]
         logger.info(f"Match table has columns: {columns}")
         
-        if 'teams' not in columns or 'match_type' not in columns:
+        if 'teams' not in columns or 'match_type' not in columns or 'updated_at' not in columns:
             logger.info("Adding missing columns to match table...")
             with db.engine.connect() as conn:
                 if 'teams' not in columns:
@@ -621,9 +705,17 @@ def ensure_match_columns_exist():
                     except Exception as e:
                         logger.warning(f"Could not add 'match_type' column (may already exist): {e}")
                         conn.rollback()
+                if 'updated_at' not in columns:
+                    try:
+                        conn.execute(text('ALTER TABLE match ADD COLUMN updated_at TIMESTAMP'))
+                        conn.commit()
+                        logger.info("Added 'updated_at' column to match table")
+                    except Exception as e:
+                        logger.warning(f"Could not add 'updated_at' column (may already exist): {e}")
+                        conn.rollback()
             logger.info("Match table columns check complete")
         else:
-            logger.info("Match table already has teams and match_type columns")
+            logger.info("Match table already has teams, match_type and updated_at columns")
     except Exception as e:
         logger.error(f"Error ensuring match columns exist: {e}")
         import traceback
@@ -671,6 +763,92 @@ def ensure_ticket_columns_exist():
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
 
+def _invalid_index_names(conn):
+    """Indexes an interrupted CREATE INDEX CONCURRENTLY left INVALID (PostgreSQL).
+
+    IF NOT EXISTS would skip them forever, so callers drop and rebuild these.
+    """
+    from sqlalchemy import text
+    rows = conn.execute(text(
+        'SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid'
+    ))
+    return {row[0] for row in rows}
+
+def _build_index_concurrently(conn, name, create_sql, invalid):
+    """Run a CREATE INDEX CONCURRENTLY, first dropping an invalid leftover of the same name"""
+    from sqlalchemy import text
+    if name in invalid:
+        logger.warning(f"Rebuilding invalid index {name}")
+        conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+    conn.execute(text(create_sql))
+
+def ensure_indexes_exist():
+    """Create model indexes missing from tables that predate them"""
+    try:
+        from sqlalchemy import inspect
+        inspector = inspect(db.engine)
+        is_postgresql = db.engine.dialect.name == 'postgresql'
+        preparer = db.engine.dialect.identifier_preparer
+        # On PostgreSQL build them CONCURRENTLY so live tables keep taking writes;
+        # that cannot run inside a transaction, hence the autocommit connection
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            invalid = _invalid_index_names(conn) if is_postgresql else set()
+            for table in db.metadata.sorted_tables:
+                existing = {index['name'] for index in inspector.get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name in existing and index.name not in invalid:
+                        continue
+                    try:
+                        if is_postgresql:
+                            # DDL written out here so the model's Index objects are left untouched
+                            columns = ', '.join(preparer.quote(column.name) for column in index.columns)
+                            unique = 'UNIQUE ' if index.unique else ''
+                            _build_index_concurrently(
+                                conn, index.name,
+                                f'CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {preparer.quote(index.name)} '
+                                f'ON {preparer.format_table(table)} ({columns})',
+                                invalid
+                            )
+                        else:
+                            index.create(bind=conn)
+                        logger.info(f"Created index {index.name}")
+                    except Exception as e:
+                        # Carry on - one failed index shouldn't leave the rest unbuilt
+                        logger.warning(f"Could not create index {index.name}: {e}")
+    except Exception as e:
+        logger.error(f"Error ensuring indexes exist: {e}")
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+
+# GIN trigram indexes let ILIKE '%...%' substring filters skip the sequential scan
+_TRIGRAM_INDEXES = (
+    ('ix_ticket_venue_trgm', 'ticket', 'venue'),
+    ('ix_user_username_trgm', '"user"', 'username'),
+)
+
+def ensure_trigram_indexes_exist():
+    """Create pg_trgm indexes for the substring-searched columns (PostgreSQL only)"""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    from sqlalchemy import text
+    # Built CONCURRENTLY like ensure_indexes_exist, so booting never blocks writes
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        try:
+            conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            invalid = _invalid_index_names(conn)
+        except Exception as e:
+            logger.warning(f"Could not enable pg_trgm, substring searches stay unindexed: {e}")
+            return
+        for name, table, column in _TRIGRAM_INDEXES:
+            try:
+                _build_index_concurrently(
+                    conn, name,
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)',
+                    invalid
+                )
+            except Exception as e:
+                logger.warning(f"Could not create trigram index {name}: {e}")
+
 def backfill_ticket_match_data():
     """Backfill teams and match_type for existing tickets from Match table"""
     try:
@@ -740,12 +918,13 @@ def backfill_ticket_match_data():
                         db.session.execute(
                             text("""
                                 UPDATE ticket 
-                                SET teams = :teams, match_type = :match_type 
+                                SET teams = :teams, match_type = :match_type, updated_at = :updated_at 
                                 WHERE id = :ticket_id
                             """),
                             {
                                 'teams': match.teams,
                                 'match_type': match.match_type,
+                                'updated_at': utcnow(),
                                 'ticket_id': ticket.id
                             }
                         )
@@ -784,13 +963,23 @@ def backfill_ticket_match_data():
 @app.route('/api/matches', methods=['GET'])
 def get_matches():
     """Get all FIFA 2026 matches for dropdown"""
+    # Schedule rarely changes - a cheap fingerprint lets the browser revalidate with a 304
+    # before the schedule is loaded or serialized
+    etag = matches_etag()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    
     # Sort by numeric part of match_number (M1, M2, M10, etc.)
     matches = Match.query.all()
     sorted_matches = sorted(matches, key=lambda m: int(m.match_number.replace('M', '')))
-    return jsonify([m.to_dict() for m in sorted_matches])
+    response = jsonify([m.to_dict() for m in sorted_matches])
+    response.set_etag(etag)
+    return response
 
 @app.route('/api/admin/backfill-tickets', methods=['POST'])
-@login_required
+@login_required_api
 def manual_backfill_tickets(user_id):
     """Manual endpoint to trigger ticket backfill - useful for production"""
     try:
@@ -809,7 +998,7 @@ def debug_matches():
     for match in matches:
         result.append({
             'match_number': match.match_number,
-            'date': match.date.strftime('%Y-%m-%d'),
+            'date': match.date.isoformat(),
             'date_raw': str(match.date),
             'venue': match.venue
         })
@@ -825,7 +1014,7 @@ def get_match_details(match_number):
 
 # Chat API endpoints
 @app.route('/api/chat/message', methods=['POST'])
-@login_required
+@login_required_api
 def send_chat_message(user_id):
     """Send a message to the AI assistant"""
     data = request.get_json()
@@ -848,36 +1037,26 @@ def send_chat_message(user_id):
             # Create new conversation
             conversation = ChatConversation(
                 user_id=user_id,
-                title=f"Chat {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+                title=f"Chat {datetime.now().isoformat(sep=' ', timespec='minutes')}"
             )
             db.session.add(conversation)
             db.session.flush()  # Get the ID
         
-        # Save user message
-        user_message = ChatMessage(
-            conversation_id=conversation.id,
-            role='user',
-            content=message
-        )
-        db.session.add(user_message)
-        
-        # Get AI response
+        # Get AI response (the context it reads excludes the message being answered)
         response = llm_service.process_message(
             user_id=user_id,
             message=message,
             conversation_id=conversation.id
         )
         
-        # Save AI response
-        ai_message = ChatMessage(
-            conversation_id=conversation.id,
-            role='assistant',
-            content=response['content']
-        )
-        db.session.add(ai_message)
+        # Save both sides of the turn in one batched insert
+        db.session.add_all([
+            ChatMessage(conversation_id=conversation.id, role='user', content=message),
+            ChatMessage(conversation_id=conversation.id, role='assistant', content=response['content'])
+        ])
         
         # Update conversation timestamp
-        conversation.updated_at = datetime.utcnow()
+        conversation.updated_at = utcnow()
         
         db.session.commit()
         
@@ -894,12 +1073,85 @@ def send_chat_message(user_id):
         logger.error(f"Error in send_chat_message: {e}")
         return jsonify({'error': 'Failed to process message'}), 500
 
+@app.route('/api/chat/message/stream', methods=['POST'])
+@login_required_api
+def stream_chat_message(user_id):
+    """Send a message to the AI assistant and stream the answer as server-sent events"""
+    data = request.get_json()
+    message = data.get('message', '').strip()
+    conversation_id = data.get('conversation_id')
+    
+    if not message:
+        return jsonify({'error': 'Message is required'}), 400
+    
+    # Get or create conversation
+    if conversation_id:
+        conversation = ChatConversation.query.filter_by(
+            id=conversation_id, 
+            user_id=user_id
+        ).first()
+        if not conversation:
+            return jsonify({'error': 'Conversation not found'}), 404
+    else:
+        conversation = ChatConversation(
+            user_id=user_id,
+            title=f"Chat {datetime.now().isoformat(sep=' ', timespec='minutes')}"
+        )
+        db.session.add(conversation)
+        # Commit up front so the new conversation has its id and is visible to other
+        # requests while the answer streams, and so a failure mid-stream doesn't lose it
+        db.session.commit()
+    conversation_id = conversation.id
+    
+    def save_turn(*messages):
+        """Persist messages of this turn and bump the conversation's updated_at"""
+        db.session.add_all(messages)
+        db.session.get(ChatConversation, conversation_id).updated_at = utcnow()
+        db.session.commit()
+    
+    def generate():
+        content_parts = []
+        try:
+            for event in llm_service.process_message_stream(
+                user_id=user_id,
+                message=message,
+                conversation_id=conversation_id
+            ):
+                if event['type'] == 'delta':
+                    content_parts.append(event['content'])
+                elif event['type'] == 'done':
+                    # Persist both sides of the turn once the answer is complete
+                    save_turn(
+                        ChatMessage(conversation_id=conversation_id, role='user', content=message),
+                        ChatMessage(conversation_id=conversation_id, role='assistant', content=''.join(content_parts))
+                    )
+                    event['conversation_id'] = conversation_id
+                else:
+                    # Failed mid-answer - keep the question so the history stays consistent
+                    save_turn(ChatMessage(conversation_id=conversation_id, role='user', content=message))
+                    event['conversation_id'] = conversation_id
+                yield f"data: {json.dumps(event)}\n\n"
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error in stream_chat_message: {e}")
+            try:
+                save_turn(ChatMessage(conversation_id=conversation_id, role='user', content=message))
+            except Exception as save_error:
+                db.session.rollback()
+                logger.error(f"Could not save message after stream error: {save_error}")
+            yield f"data: {json.dumps({'type': 'error', 'error': 'Failed to process message', 'conversation_id': conversation_id})}\n\n"
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/chat/conversations', methods=['GET'])
-@login_required
+@login_required_api
 def get_chat_conversations(user_id):
     """Get all conversations for the current user"""
     try:
-        conversations = ChatConversation.query.filter_by(
+        conversations = ChatConversation.query.options(
+            undefer(ChatConversation.message_count)
+        ).filter_by(
             user_id=user_id
         ).order_by(ChatConversation.updated_at.desc()).all()
         
@@ -909,7 +1161,7 @@ def get_chat_conversations(user_id):
         return jsonify({'error': 'Failed to get conversations'}), 500
 
 @app.route('/api/chat/conversations/<int:conversation_id>', methods=['GET'])
-@login_required
+@login_required_api
 def get_chat_conversation(conversation_id, user_id):
     """Get a specific conversation with its messages"""
     try:
@@ -934,7 +1186,7 @@ def get_chat_conversation(conversation_id, user_id):
         return jsonify({'error': 'Failed to get conversation'}), 500
 
 @app.route('/api/chat/conversations/<int:conversation_id>', methods=['DELETE'])
-@login_required
+@login_required_api
 def delete_chat_conversation(conversation_id, user_id):
     """Delete a conversation"""
     try:
@@ -956,7 +1208,7 @@ def delete_chat_conversation(conversation_id, user_id):
         return jsonify({'error': 'Failed to delete conversation'}), 500
 
 @app.route('/api/chat/conversations/<int:conversation_id>/save', methods=['POST'])
-@login_required
+@login_required_api
 def save_chat_conversation(conversation_id, user_id):
     """Mark a conversation as saved"""
     try:
@@ -978,7 +1230,7 @@ def save_chat_conversation(conversation_id, user_id):
         return jsonify({'error': 'Failed to save conversation'}), 500
 
 @app.route('/api/chat/conversations/<int:conversation_id>/unsave', methods=['POST'])
-@login_required
+@login_required_api
 def unsave_chat_conversation(conversation_id, user_id):
     """Mark a conversation as not saved"""
     try:
@@ -1001,11 +1253,11 @@ def unsave_chat_conversation(conversation_id, user_id):
 
 # Profile API endpoints
 @app.route('/api/profile', methods=['GET'])
-@login_required
+@login_required_api
 def get_profile(user_id):
     """Get current user profile"""
     try:
-        user = User.query.get(user_id)
+        user = db.session.get(User, user_id)
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
@@ -1013,18 +1265,18 @@ def get_profile(user_id):
             'id': user.id,
             'username': user.username,
             'favorite_team': user.favorite_team,
-            'created_at': user.created_at.strftime('%Y-%m-%d %H:%M') if user.created_at else None
+            'created_at': user.created_at.isoformat(sep=' ', timespec='minutes') if user.created_at else None
         })
     except Exception as e:
         logger.error(f"Error in get_profile: {e}")
         return jsonify({'error': 'Failed to get profile'}), 500
 
 @app.route('/api/profile', methods=['PUT'])
-@login_required
+@login_required_api
 def update_profile(user_id):
     """Update user profile"""
     try:
-        user = User.query.get(user_id)
+        user = db.session.get(User, user_id)
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
@@ -1047,7 +1299,7 @@ def update_profile(user_id):
             'id': user.id,
             'username': user.username,
             'favorite_team': user.favorite_team,
-            'created_at': user.created_at.strftime('%Y-%m-%d %H:%M') if user.created_at else None
+            'created_at': user.created_at.isoformat(sep=' ', timespec='minutes') if user.created_at else None
         })
         
     except Exception as e:
@@ -1064,11 +1316,19 @@ with app.app_context():
         ensure_match_columns_exist()
         
         # Initialize match schedule data from CSV (must run first, populates teams and match_type)
-        init_match_data()
+        # Only on an empty table or when explicitly requested - use `flask load-matches` to reload
+        if os.environ.get('RELOAD_MATCHES') == '1' or Match.query.count() == 0:
+            init_match_data()
+        else:
+            logger.info("Match data already loaded, skipping CSV import (set RELOAD_MATCHES=1 to force)")
         
         # Ensure ticket table has teams and match_type columns
         ensure_ticket_columns_exist()
         
+        # db.create_all() skips indexes on tables that already exist
+        ensure_indexes_exist()
+        ensure_trigram_indexes_exist()
+        
         # Backfill existing tickets with teams and match_type (runs after matches are loaded)
         backfill_ticket_match_data()
         
@@ -1088,6 +1348,12 @@ with app.app_context():
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
 
+@app.cli.command('load-matches')
+def load_matches_command():
+    """Reload the FIFA 2026 match schedule from CSV and backfill tickets"""
+    init_match_data()
+    backfill_ticket_match_data()
+
 @app.route('/api/venues', methods=['GET'])
 def get_venues():
     """Get all unique venues with coordinates"""
@@ -1114,7 +1380,10 @@ def get_venues():
         {"name": "Mexico City", "city": "Mexico City", "country": "Mexico", "lat": 19.4326, "lng": -99.1332},
         {"name": "Monterrey", "city": "Monterrey", "country": "Mexico", "lat": 25.6866, "lng": -100.3161},
     ]
-    return jsonify(venues)
+    # Venue list is hardcoded, so it is safe to cache for a week
+    response = jsonify(venues)
+    response.headers['Cache-Control'] = 'public, max-age=604800, immutable'
+    return response
 
 if __name__ == '__main__':
     # Only run development server if not in production
@@ -5,43 +5,87 @@ Check production database data for specific matches
 
 import os
 import sys
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import atexit
+from psycopg2.errors import InvalidSqlStatementName
+from psycopg2.extensions import connection
+from psycopg2.pool import ThreadedConnectionPool
 
 def get_database_url():
     """Get database URL from environment variable"""
     return os.environ.get('DATABASE_URL')
 
+class MatchCheckConnection(connection):
+    """Connection that remembers whether match_range is prepared in its session.
+
+    The flag lives on the connection, so one the pool closes or replaces takes it along
+    and its successor starts unprepared.
+    """
+    match_range_prepared = False
+
+# Reuse connections across calls instead of reconnecting (TCP + TLS + auth) every time
+_pool = None
+
+def get_pool():
+    """Return the connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        _pool = ThreadedConnectionPool(
+            1, 4, dsn=get_database_url(), connection_factory=MatchCheckConnection
+        )
+        atexit.register(_pool.closeall)
+    return _pool
+
+# Matches around the M73 date fix
+CHECK_MATCHES = ['M70', 'M71', 'M72', 'M73', 'M74', 'M75']
+
+# Server-side prepared once per pooled connection, so repeated checks skip parse/plan
+PREPARE_MATCH_RANGE = (
+    "PREPARE match_range AS "
+    "SELECT match_number, date, venue FROM match WHERE match_number = ANY($1) ORDER BY match_number"
+)
+
 def check_match_data():
     """Check specific match data in production"""
-    database_url = get_database_url()
-    if not database_url:
+    if not get_database_url():
         print("❌ DATABASE_URL environment variable not set")
         return
     
+    conn = None
     try:
-        conn = psycopg2.connect(database_url)
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        conn = get_pool().getconn()
+        # Plain tuple rows - no per-row dict construction
+        with conn.cursor() as cur:
+            # One round trip for M70-M75; M73 is picked out of the same result
+            if not conn.match_range_prepared:
+                cur.execute(PREPARE_MATCH_RANGE)
+                conn.match_range_prepared = True
+            try:
+                cur.execute("EXECUTE match_range(%s)", (CHECK_MATCHES,))
+            except InvalidSqlStatementName:
+                # The session was reset (e.g. DISCARD ALL) since we prepared - prepare again
+                conn.rollback()
+                cur.execute(PREPARE_MATCH_RANGE)
+                cur.execute("EXECUTE match_range(%s)", (CHECK_MATCHES,))
+            matches = cur.fetchall()
+            by_number = {match[0]: match for match in matches}
+            
             # Check M73 specifically
-            cur.execute("SELECT match_number, date, venue FROM match WHERE match_number = 'M73'")
-            m73 = cur.fetchone()
+            m73 = by_number.get('M73')
             if m73:
-                print(f"M73: {m73['date']} at {m73['venue']}")
+                print(f"M73: {m73[1]} at {m73[2]}")
             else:
                 print("M73 not found")
             
             # Check a few more matches around that area
-            cur.execute("SELECT match_number, date, venue FROM match WHERE match_number IN ('M70', 'M71', 'M72', 'M73', 'M74', 'M75') ORDER BY match_number")
-            matches = cur.fetchall()
             print("\nMatches M70-M75:")
-            for match in matches:
-                print(f"{match['match_number']}: {match['date']} at {match['venue']}")
+            for match_number, match_date, venue in matches:
+                print(f"{match_number}: {match_date} at {venue}")
                 
     except Exception as e:
         print(f"Error: {e}")
     finally:
-        if 'conn' in locals():
-            conn.close()
+        if conn is not None:
+            get_pool().putconn(conn)
 
 if __name__ == "__main__":
     check_match_data()
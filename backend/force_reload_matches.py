@@ -7,7 +7,9 @@ This script will replace all existing match data with the corrected CSV data
 import os
 import sys
 import csv
-from datetime import datetime
+import mmap
+from datetime import date
+from sqlalchemy import insert
 
 # Add the backend directory to the Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -28,19 +30,31 @@ def force_reload_matches():
         csv_path = os.path.join(os.path.dirname(__file__), 'data', 'fifa_match_schedule.csv')
         
         try:
-            with open(csv_path, 'r') as f:
-                reader = csv.DictReader(f)
-                match_count = 0
-                for row in reader:
-                    match = Match(
-                        match_number=row['match_number'],
-                        date=datetime.strptime(row['date'], '%Y-%m-%d').date(),
-                        venue=row['venue']
-                    )
-                    db.session.add(match)
-                    match_count += 1
-                db.session.commit()
-                print(f"✅ Loaded {match_count} FIFA 2026 matches from corrected CSV")
+            # Map the file and decode it in one go rather than line by line
+            with open(csv_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                text = mm[:].decode('utf-8')
+            
+            # Plain csv.reader with column indices resolved once from the header
+            reader = csv.reader(text.splitlines())
+            header = next(reader)
+            number_col, date_col, venue_col = (
+                header.index('match_number'), header.index('date'), header.index('venue')
+            )
+            rows = [
+                {
+                    'match_number': row[number_col],
+                    'date': date.fromisoformat(row[date_col]),
+                    'venue': row[venue_col]
+                }
+                for row in reader
+                if row
+            ]
+            
+            # Single executemany INSERT instead of one INSERT per ORM object
+            if rows:
+                db.session.execute(insert(Match), rows)
+            db.session.commit()
+            print(f"✅ Loaded {len(rows)} FIFA 2026 matches from corrected CSV")
                 
         except FileNotFoundError:
             print(f"❌ Error: Match schedule CSV not found at {csv_path}")
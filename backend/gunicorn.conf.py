@@ -0,0 +1,32 @@
+"""Gunicorn configuration for the FIFA 2026 Tickets backend
+
+Picked up automatically by `gunicorn app:app` when run from the backend directory.
+"""
+import os
+
+# Bind to Railway's PORT (falls back to the Docker port)
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# gevent workers let blocking DB and OpenAI calls yield to other requests
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 500))
+
+# LLM calls can take a while - don't kill workers mid-response
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# Access log stays off unless ACCESS_LOG names a target ('-' for stdout); when on,
+# a short format keeps per-request formatting cheap
+accesslog = os.environ.get('ACCESS_LOG') or None
+access_log_format = '%(s)s %(D)s %(r)s'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'warning' if os.environ.get('FLASK_ENV') == 'production' else 'info')
+
+
+def post_fork(server, worker):
+    """Make psycopg2 cooperative so DB waits don't block the gevent loop"""
+    if worker_class == 'gevent':
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
@@ -1,7 +1,15 @@
 """JWT utility functions for authentication"""
 import jwt
 import os
-from datetime import datetime, timedelta
+import time
+import hmac
+import json
+import base64
+import hashlib
+import string
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from functools import wraps
 from flask import request, jsonify
 
@@ -10,22 +18,121 @@ JWT_SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-producti
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_DAYS = 7
 
+# Precomputed per-process so token generation/verification doesn't redo them per call
+_SECRET_BYTES = JWT_SECRET_KEY.encode('utf-8')
+_EXP_DELTA = timedelta(days=JWT_EXPIRATION_DAYS)
+_jwt = jwt.PyJWT()
+
+# Our tokens are a few hundred bytes - anything far larger is rejected before any decoding
+MAX_TOKEN_LENGTH = 4096
+# base64url characters; JWT segments carry no padding
+_JWT_ALPHABET = frozenset(string.ascii_letters + string.digits + '-_')
+
+# Verified-token cache: sha256(token) -> (payload, cached_until). The signature binds the
+# payload, so a tampered token hashes differently and simply misses the cache; keying on
+# the digest keeps raw bearer tokens out of long-lived process memory.
+TOKEN_CACHE_TTL_SECONDS = 60
+TOKEN_CACHE_MAX_SIZE = 4096
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+
 
 def generate_token(user_id: int, username: str) -> str:
     """Generate a JWT token for a user"""
+    now = datetime.now(timezone.utc)
     payload = {
         'user_id': user_id,
         'username': username,
-        'exp': datetime.utcnow() + timedelta(days=JWT_EXPIRATION_DAYS),
-        'iat': datetime.utcnow()
+        'exp': now + _EXP_DELTA,
+        'iat': now
     }
-    return jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+    return _jwt.encode(payload, _SECRET_BYTES, algorithm=JWT_ALGORITHM)
+
+
+def _b64url_decode(segment: str) -> bytes:
+    """Decode a base64url JWT segment (padding stripped)"""
+    return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+
+
+def _verify_hs256(token: str) -> dict:
+    """Verify an HS256 token directly with hmac/hashlib (OpenSSL-backed), skipping PyJWT's dispatch"""
+    try:
+        # Locate the two dots once and slice; the signing input is the token's own prefix
+        first_dot = token.index('.')
+        last_dot = token.index('.', first_dot + 1)
+        if token.find('.', last_dot + 1) != -1:
+            raise ValueError('Too many segments')
+        header_b64 = token[:first_dot]
+        payload_b64 = token[first_dot + 1:last_dot]
+        
+        header = json.loads(_b64url_decode(header_b64))
+        if not isinstance(header, dict) or header.get('alg') != JWT_ALGORITHM:
+            raise jwt.InvalidAlgorithmError('The specified alg value is not allowed')
+        
+        expected = hmac.new(_SECRET_BYTES, token[:last_dot].encode('ascii'), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64url_decode(token[last_dot + 1:])):
+            raise jwt.InvalidSignatureError('Signature verification failed')
+        
+        payload = json.loads(_b64url_decode(payload_b64))
+    except jwt.InvalidTokenError:
+        raise
+    except (ValueError, TypeError, UnicodeError):
+        raise jwt.DecodeError('Invalid token format')
+    
+    if not isinstance(payload, dict):
+        raise jwt.DecodeError('Invalid payload')
+    
+    # Registered-claim checks as PyJWT applies them (no leeway), with exp required
+    now = time.time()
+    if 'exp' not in payload:
+        raise jwt.MissingRequiredClaimError('exp')
+    if not isinstance(payload['exp'], (int, float)):
+        raise jwt.DecodeError('Expiration Time claim (exp) must be an integer.')
+    if payload['exp'] <= now:
+        raise jwt.ExpiredSignatureError('Signature has expired')
+    if 'nbf' in payload:
+        if not isinstance(payload['nbf'], (int, float)):
+            raise jwt.DecodeError('Not Before claim (nbf) must be an integer.')
+        if payload['nbf'] > now:
+            raise jwt.ImmatureSignatureError('The token is not yet valid (nbf)')
+    
+    return payload
+
+
+def _is_well_formed(token: str) -> bool:
+    """Cheap structural check: three non-empty base64url segments, no decoding or hashing"""
+    if token.count('.') != 2:
+        return False
+    return all(part and _JWT_ALPHABET.issuperset(part) for part in token.split('.'))
 
 
 def verify_token(token: str) -> dict:
-    """Verify and decode a JWT token"""
+    """Verify and decode a JWT token (recently verified tokens are served from cache)"""
+    if len(token) > MAX_TOKEN_LENGTH:
+        raise ValueError('Token too large')
+    # Garbage tokens are turned away here, before the cache digest, base64/JSON or HMAC work
+    if not _is_well_formed(token):
+        raise ValueError('Invalid token')
+    
+    now = time.time()
+    cache_key = hashlib.sha256(token.encode('utf-8')).digest()
+    with _token_cache_lock:
+        cached = _token_cache.get(cache_key)
+        if cached:
+            payload, cached_until = cached
+            if now < cached_until:
+                _token_cache.move_to_end(cache_key)
+                return payload
+            del _token_cache[cache_key]
+    
     try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        payload = _verify_hs256(token)
+        # Never serve a token from cache past its own expiry
+        cached_until = min(now + TOKEN_CACHE_TTL_SECONDS, payload['exp'])
+        with _token_cache_lock:
+            _token_cache[cache_key] = (payload, cached_until)
+            if len(_token_cache) > TOKEN_CACHE_MAX_SIZE:
+                _token_cache.popitem(last=False)
         return payload
     except jwt.ExpiredSignatureError:
         raise ValueError('Token has expired')
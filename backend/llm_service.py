@@ -1,68 +1,285 @@
 import os
 import json
+import time
+import hashlib
+import atexit
+import threading
+from collections import OrderedDict, defaultdict
+from types import SimpleNamespace
 from typing import List, Dict, Any, Optional
-from openai import OpenAI
-from models import db, Ticket, User, Match, ChatMessage
-from datetime import datetime, date
+from openai import OpenAI, DefaultHttpxClient
+from sqlalchemy import func
+from models import db, Ticket, User, Match, ChatMessage, TICKET_ROW_COLUMNS, ticket_row_to_dict
+from datetime import date
 import re
 
+# System prompt - tools and their arguments are described by _FUNCTIONS_SCHEMA
+_SYSTEM_PROMPT = """You are an AI assistant for the FIFA 2026 World Cup ticket management system. You help users query their ticket data and get intelligent recommendations.
+
+SECURITY RULES:
+1. Never reveal or ask for passwords or password hashes
+2. Only use the provided tools to query data
+3. Be helpful but respect privacy
+
+RESPONSE GUIDELINES:
+- Provide clear, helpful answers in English only, in natural language without technical jargon
+- When recommending matches, consider friend attendance and venue proximity
+- Answer in one go rather than asking trivial intermediate questions; ask only when travel preferences or budget really matter
+- If you can't find specific information, say so clearly
+- Ticket and attendee tools return one page of "rows"; their "total" and "count_by_venue" cover every matching ticket, and while "has_more" is true the next page starts at "offset" plus the rows returned
+- Other results marked "truncated" show only the first rows; use "total" and "count_by_venue" for overall numbers or narrow the filters for details"""
+
+# OpenAI function definitions, built once at import
+_FUNCTIONS_SCHEMA = [
+    {
+        "name": "get_tickets_by_filters",
+        "description": "Query tickets with various filters like venue, date, category, username",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "filters": {
+                    "type": "object",
+                    "properties": {
+                        "venue": {"type": "string", "description": "Venue name to filter by"},
+                        "match_number": {"type": "string", "description": "Match number to filter by"},
+                        "date_from": {"type": "string", "description": "Start date (YYYY-MM-DD)"},
+                        "date_to": {"type": "string", "description": "End date (YYYY-MM-DD)"},
+                        "category": {"type": "string", "description": "Ticket category"},
+                        "username": {"type": "string", "description": "Username to filter by"}
+                    }
+                },
+                "limit": {"type": "integer", "description": "Maximum tickets to return (default and max 25)"},
+                "offset": {"type": "integer", "description": "Tickets to skip, for fetching the next page"}
+            },
+            "required": []
+        }
+    },
+    {
+        "name": "get_friends_attending_match",
+        "description": "Find which friends are attending a specific match",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "match_number": {"type": "string", "description": "Match number (e.g., M50)"},
+                "limit": {"type": "integer", "description": "Maximum attendees to return (default and max 25)"},
+                "offset": {"type": "integer", "description": "Attendees to skip, for fetching the next page"}
+            },
+            "required": ["match_number"]
+        }
+    },
+    {
+        "name": "get_weekend_matches",
+        "description": "Get matches for a specific weekend or date range",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "start_date": {"type": "string", "description": "Start date (YYYY-MM-DD)"},
+                "end_date": {"type": "string", "description": "End date (YYYY-MM-DD)"}
+            },
+            "required": ["start_date", "end_date"]
+        }
+    },
+    {
+        "name": "get_venue_info",
+        "description": "Get match counts per venue, or the match schedule for a specific venue",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "venue": {"type": "string", "description": "Venue name to get info for (optional)"}
+            },
+            "required": []
+        }
+    },
+    {
+        "name": "get_user_tickets",
+        "description": "Get all tickets for the current user",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "limit": {"type": "integer", "description": "Maximum tickets to return (default and max 25)"},
+                "offset": {"type": "integer", "description": "Tickets to skip, for fetching the next page"}
+            },
+            "required": []
+        }
+    },
+    {
+        "name": "get_match_details",
+        "description": "Get details about a specific match",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "match_number": {"type": "string", "description": "Match number (e.g., M50)"}
+            },
+            "required": ["match_number"]
+        }
+    }
+]
+
+# Columns projected for tool results - plain rows, no ORM objects to build
+_MATCH_COLUMNS = (Match.match_number, Match.date, Match.venue, Match.teams, Match.match_type)
+
+def _match_row_to_dict(row) -> Dict[str, Any]:
+    """Same shape as Match.to_dict(), built from a _MATCH_COLUMNS row"""
+    match = dict(row._mapping)
+    match['date'] = row.date.isoformat()
+    return match
+
+# Most rows of a tool result sent back to the model; the client still gets them all
+TOOL_RESULT_MAX_ROWS = 25
+# Bookkeeping and free-text fields the model does not need to answer questions
+_TOOL_RESULT_OMIT_FIELDS = ('created_at', 'updated_at', 'ticket_info')
+
+# Page size for tool queries that can return many rows - a full page fits in one tool
+# result, so paging never skips rows the model didn't see
+TOOL_QUERY_DEFAULT_LIMIT = TOOL_RESULT_MAX_ROWS
+TOOL_QUERY_MAX_LIMIT = TOOL_RESULT_MAX_ROWS
+
+def _page_bounds(limit: Optional[int], offset: Optional[int]):
+    """Clamp model-supplied paging arguments to sane values"""
+    limit = TOOL_QUERY_DEFAULT_LIMIT if limit is None else max(1, min(int(limit), TOOL_QUERY_MAX_LIMIT))
+    offset = max(0, int(offset or 0))
+    return limit, offset
+
+def _ticket_page(query, rows: List[Dict], offset: int) -> Dict[str, Any]:
+    """One page of a ticket query, with totals counted over every ticket it matches.
+
+    query is the filtered query before ordering and paging.
+    """
+    count_by_venue = dict(
+        query.with_entities(Ticket.venue, func.count(Ticket.id)).group_by(Ticket.venue).all()
+    )
+    total = sum(count_by_venue.values())
+    return {
+        "rows": rows,
+        "offset": offset,
+        "total": total,
+        "has_more": offset + len(rows) < total,
+        "count_by_venue": count_by_venue
+    }
+
+def _is_page(result: Any) -> bool:
+    return isinstance(result, dict) and 'has_more' in result
+
+def _client_result(result: Any) -> Any:
+    """Tool result as returned to the client: pages are reduced to their rows"""
+    return result['rows'] if _is_page(result) else result
+
+# Routes every chat request to the same OpenAI prompt-cache shard: all turns share the
+# system prompt + tools prefix
+_PROMPT_CACHE_KEY = 'fifa-tickets-chat'
+
+def _omit_fields(row: Any) -> Any:
+    return {k: v for k, v in row.items() if k not in _TOOL_RESULT_OMIT_FIELDS} if isinstance(row, dict) else row
+
+def _trim_tool_result(result: Any) -> Any:
+    """Shrink a tool result for the prompt: drop unneeded fields and cap row count"""
+    if _is_page(result):
+        # Pages are already capped and carry their own totals
+        return {**result, "rows": [_omit_fields(row) for row in result['rows']]}
+    if not isinstance(result, list):
+        return result
+    rows = [_omit_fields(row) for row in result[:TOOL_RESULT_MAX_ROWS]]
+    if len(result) <= TOOL_RESULT_MAX_ROWS:
+        return rows
+    # Summarize what was cut so the model can narrow its next tool call
+    by_venue = {}
+    for row in result:
+        if isinstance(row, dict) and 'venue' in row:
+            by_venue[row['venue']] = by_venue.get(row['venue'], 0) + 1
+    return {"rows": rows, "truncated": True, "total": len(result), "count_by_venue": by_venue}
+
+# Questions that need planning or judgement go to the full model; lookups use the fast one
+_OPEN_ENDED_PATTERN = re.compile(
+    r'\b(recommend\w*|suggest\w*|itinerar\w*|plan\w*|best|should|compare|why|trip|advice)\b',
+    re.IGNORECASE
+)
+FAST_MODEL_MAX_MESSAGE_LENGTH = 200
+
+# Punctuation ignored when matching a question against cached answers
+_CACHE_KEY_PUNCTUATION = re.compile(r'[^\w\s-]+')
+
+# Same definitions in the tools format used by tool_calls
+_TOOLS_SCHEMA = [{"type": "function", "function": function} for function in _FUNCTIONS_SCHEMA]
+
+# One keep-alive connection pool to the OpenAI API shared by every LLMService
+_http_client = None
+_http_client_lock = threading.Lock()
+
+def _get_http_client() -> DefaultHttpxClient:
+    """Return the process-wide HTTP/2 client, creating it on first use"""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            # Keeps the SDK's default timeout and keep-alive pool limits
+            _http_client = DefaultHttpxClient(http2=True)
+            atexit.register(_http_client.close)
+        return _http_client
+
+class ResponseCache:
+    """In-process LRU cache with a TTL.
+
+    Keys must already capture everything the cached value depends on, e.g. the
+    user, question, prior conversation turns and state of the ticket data for
+    assistant answers.
+    """
+
+    def __init__(self, max_size: int = 512, ttl_seconds: int = 300):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            value, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
 class LLMService:
     def __init__(self):
         api_key = os.environ.get('OPENAI_API_KEY')
         if api_key:
-            self.client = OpenAI(api_key=api_key)
-            self.model = "gpt-4"
+            # The SDK retries 429s, timeouts and 5xx with exponential backoff and jitter
+            self.client = OpenAI(
+                api_key=api_key,
+                http_client=_get_http_client(),
+                max_retries=int(os.environ.get('OPENAI_MAX_RETRIES', '4')),
+                timeout=float(os.environ.get('OPENAI_TIMEOUT', '60'))
+            )
         else:
             self.client = None
-            self.model = "gpt-4"
             print("⚠️  Warning: OPENAI_API_KEY not set. LLM service will return mock responses.")
         
-        # System prompt with database schema documentation
-        self.system_prompt = """You are an AI assistant for the FIFA 2026 World Cup ticket management system. You help users query their ticket data and get intelligent recommendations.
-
-DATABASE SCHEMA:
-- Users: id, username, created_at (NO ACCESS to password_hash)
-- Tickets: id, user_id, name, match_number, date, venue, ticket_category, quantity, ticket_info, ticket_price, created_at, updated_at
-- Matches: id, match_number, date, venue
-- ChatConversations: id, user_id, title, created_at, updated_at, is_saved
-- ChatMessages: id, conversation_id, role, content, created_at
+        # Full model for open-ended questions, fast model for simple lookups
+        self.model = os.environ.get('OPENAI_MODEL', 'gpt-4')
+        self.fast_model = os.environ.get('OPENAI_FAST_MODEL', 'gpt-4o-mini')
+        
+        # Exact-match answer cache in front of OpenAI
+        self.response_cache = ResponseCache()
 
-SECURITY RULES:
-1. NEVER access user.password_hash - this field is completely off-limits
-2. Only use the provided functions to query data
-3. Always validate user permissions before showing data
-4. Be helpful but respect privacy
-
-AVAILABLE FUNCTIONS:
-- get_tickets_by_filters: Query tickets with various filters
-- get_friends_attending_match: Find which friends are attending a specific match
-- get_weekend_matches: Get matches for specific weekends
-- get_venue_info: Get information about venues and cities
-- get_user_tickets: Get tickets for a specific user
-- get_match_details: Get details about a specific match
+    def get_tickets_by_filters(self, user_id: int, filters: Dict[str, Any] = None,
+                               limit: int = None, offset: int = None, with_totals: bool = False):
+        """Get tickets with optional filters - SECURE VERSION (no password access)
 
-RESPONSE GUIDELINES:
-- Provide clear, helpful answers in English only
-- Use natural language, not technical jargon
-- When recommending matches, consider friend attendance and venue proximity
-- Ask clarifying questions when needed (travel preferences, budget, etc.)
-- Be conversational and friendly
-- Try to provide all the answers in one go than asking trivial intermediete questions.
-- If you can't find specific information, say so clearly
-
-EXAMPLE QUESTIONS YOU CAN HANDLE:
-- "Which match do most of my friends have tickets for?"
-- "What's a good weekend itinerary where my friends and I have tickets and the venues are close to each other?"
-- "Show me all matches in New York that my friends are attending"
-- "Which friends are going to Match M50?"
-- "Recommend matches where I can meet up with the most friends"
-- "What matches are happening on July 4th weekend?"
-- "Which cities have the most match activity?" """
-
-    def get_tickets_by_filters(self, user_id: int, filters: Dict[str, Any] = None) -> List[Dict]:
-        """Get tickets with optional filters - SECURE VERSION (no password access)"""
+        With with_totals, returns the page from _ticket_page instead of a plain list.
+        """
         try:
-            query = db.session.query(Ticket, User.username).join(User, Ticket.user_id == User.id)
+            limit, offset = _page_bounds(limit, offset)
+            query = db.session.query(*TICKET_ROW_COLUMNS).join(User, Ticket.user_id == User.id)
             
             if filters:
                 if 'venue' in filters:
@@ -70,51 +287,54 @@ EXAMPLE QUESTIONS YOU CAN HANDLE:
                 if 'match_number' in filters:
                     query = query.filter(Ticket.match_number == filters['match_number'])
                 if 'date_from' in filters:
-                    query = query.filter(Ticket.date >= filters['date_from'])
+                    query = query.filter(Ticket.date >= date.fromisoformat(filters['date_from']))
                 if 'date_to' in filters:
-                    query = query.filter(Ticket.date <= filters['date_to'])
+                    query = query.filter(Ticket.date <= date.fromisoformat(filters['date_to']))
                 if 'category' in filters:
                     query = query.filter(Ticket.ticket_category == filters['category'])
                 if 'username' in filters:
                     query = query.filter(User.username.ilike(f"%{filters['username']}%"))
             
-            results = query.all()
+            results = query.order_by(Ticket.date, Ticket.id).limit(limit).offset(offset).all()
             
             # Convert to safe format (no password_hash)
-            tickets = []
-            for ticket, username in results:
-                ticket_dict = ticket.to_dict()
-                ticket_dict['username'] = username  # Use the joined username
-                tickets.append(ticket_dict)
-            
-            return tickets
+            tickets = [ticket_row_to_dict(row) for row in results]
+            return _ticket_page(query, tickets, offset) if with_totals else tickets
         except Exception as e:
             print(f"Error in get_tickets_by_filters: {e}")
             return []
 
-    def get_friends_attending_match(self, user_id: int, match_number: str) -> List[Dict]:
-        """Find which friends are attending a specific match"""
+    def get_friends_attending_match(self, user_id: int, match_number: str,
+                                    limit: int = None, offset: int = None, with_totals: bool = False):
+        """Find which friends are attending a specific match
+
+        With with_totals, returns the page from _ticket_page instead of a plain list.
+        """
         try:
+            limit, offset = _page_bounds(limit, offset)
             # Get all users except the current user who have tickets for this match
-            query = db.session.query(Ticket, User.username).join(User, Ticket.user_id == User.id).filter(
+            query = db.session.query(
+                User.username, Ticket.name, Ticket.quantity, Ticket.ticket_category,
+                Ticket.venue, Ticket.date
+            ).join(User, Ticket.user_id == User.id).filter(
                 Ticket.match_number == match_number,
                 Ticket.user_id != user_id
             )
             
-            results = query.all()
+            results = query.order_by(User.username, Ticket.id).limit(limit).offset(offset).all()
             
             friends = []
-            for ticket, username in results:
+            for row in results:
                 friends.append({
-                    'username': username,
-                    'name': ticket.name,
-                    'quantity': ticket.quantity,
-                    'category': ticket.ticket_category,
-                    'venue': ticket.venue,
-                    'date': ticket.date.strftime('%Y-%m-%d')
+                    'username': row.username,
+                    'name': row.name,
+                    'quantity': row.quantity,
+                    'category': row.ticket_category,
+                    'venue': row.venue,
+                    'date': row.date.isoformat()
                 })
             
-            return friends
+            return _ticket_page(query, friends, offset) if with_totals else friends
         except Exception as e:
             print(f"Error in get_friends_attending_match: {e}")
             return []
@@ -122,15 +342,15 @@ EXAMPLE QUESTIONS YOU CAN HANDLE:
     def get_weekend_matches(self, start_date: str, end_date: str) -> List[Dict]:
         """Get matches for a specific weekend"""
         try:
-            start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-            end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
+            start_date_obj = date.fromisoformat(start_date)
+            end_date_obj = date.fromisoformat(end_date)
             
-            matches = Match.query.filter(
+            matches = db.session.query(*_MATCH_COLUMNS).filter(
                 Match.date >= start_date_obj,
                 Match.date <= end_date_obj
-            ).all()
+            ).order_by(Match.date, Match.match_number).all()
             
-            return [match.to_dict() for match in matches]
+            return [_match_row_to_dict(row) for row in matches]
         except Exception as e:
             print(f"Error in get_weekend_matches: {e}")
             return []
@@ -138,34 +358,43 @@ EXAMPLE QUESTIONS YOU CAN HANDLE:
     def get_venue_info(self, venue: str = None) -> List[Dict]:
         """Get information about venues and cities"""
         try:
-            if venue:
-                # Get all matches for a specific venue
-                matches = Match.query.filter(Match.venue.ilike(f"%{venue}%")).all()
-            else:
-                # Get all unique venues
-                matches = Match.query.all()
+            if not venue:
+                # One row per venue, counted by the database
+                rows = db.session.query(
+                    Match.venue, func.count(Match.id).label('total')
+                ).group_by(Match.venue).order_by(Match.venue).all()
+                return [{'venue': name, 'total_matches': total} for name, total in rows]
             
-            venues = {}
+            # Schedule for matching venues, ordered so each venue's matches are contiguous
+            matches = db.session.query(*_MATCH_COLUMNS).filter(
+                Match.venue.ilike(f"%{venue}%")
+            ).order_by(Match.venue, Match.date).all()
+            
+            venues = defaultdict(list)
             for match in matches:
-                if match.venue not in venues:
-                    venues[match.venue] = {
-                        'venue': match.venue,
-                        'matches': [],
-                        'total_matches': 0
-                    }
-                venues[match.venue]['matches'].append(match.to_dict())
-                venues[match.venue]['total_matches'] += 1
+                venues[match.venue].append(_match_row_to_dict(match))
             
-            return list(venues.values())
+            return [
+                {'venue': name, 'matches': schedule, 'total_matches': len(schedule)}
+                for name, schedule in venues.items()
+            ]
         except Exception as e:
             print(f"Error in get_venue_info: {e}")
             return []
 
-    def get_user_tickets(self, user_id: int) -> List[Dict]:
-        """Get all tickets for a specific user"""
+    def get_user_tickets(self, user_id: int, limit: int = None, offset: int = None, with_totals: bool = False):
+        """Get all tickets for a specific user
+
+        With with_totals, returns the page from _ticket_page instead of a plain list.
+        """
         try:
-            tickets = Ticket.query.filter_by(user_id=user_id).all()
-            return [ticket.to_dict() for ticket in tickets]
+            limit, offset = _page_bounds(limit, offset)
+            query = db.session.query(*TICKET_ROW_COLUMNS).outerjoin(
+                User, Ticket.user_id == User.id
+            ).filter(Ticket.user_id == user_id)
+            rows = query.order_by(Ticket.date, Ticket.id).limit(limit).offset(offset).all()
+            tickets = [ticket_row_to_dict(row) for row in rows]
+            return _ticket_page(query, tickets, offset) if with_totals else tickets
         except Exception as e:
             print(f"Error in get_user_tickets: {e}")
             return []
@@ -179,196 +408,255 @@ EXAMPLE QUESTIONS YOU CAN HANDLE:
             print(f"Error in get_match_details: {e}")
             return None
 
+    def get_matches_by_numbers(self, match_numbers: List[str]) -> Dict[str, Dict]:
+        """Get details for several matches in one query, keyed by match number"""
+        try:
+            matches = db.session.query(*_MATCH_COLUMNS).filter(Match.match_number.in_(match_numbers)).all()
+            return {row.match_number: _match_row_to_dict(row) for row in matches}
+        except Exception as e:
+            print(f"Error in get_matches_by_numbers: {e}")
+            return {}
+
     def get_conversation_context(self, conversation_id: int, limit: int = 10) -> List[Dict]:
         """Get recent conversation context for the LLM"""
         try:
-            messages = ChatMessage.query.filter_by(conversation_id=conversation_id).order_by(
-                ChatMessage.created_at.desc()
-            ).limit(limit).all()
+            # Only role and content go into the prompt
+            rows = db.session.query(ChatMessage.role, ChatMessage.content).filter(
+                ChatMessage.conversation_id == conversation_id
+            ).order_by(ChatMessage.id.desc()).limit(limit).all()
             
             # Reverse to get chronological order
-            return [msg.to_dict() for msg in reversed(messages)]
+            return [{'role': row.role, 'content': row.content} for row in reversed(rows)]
         except Exception as e:
             print(f"Error in get_conversation_context: {e}")
             return []
 
+    def _data_version(self) -> str:
+        """Fingerprint of the ticket and match data the tool functions read"""
+        ticket_count, max_ticket_id, last_updated = db.session.query(
+            func.count(Ticket.id), func.max(Ticket.id), func.max(Ticket.updated_at)
+        ).one()
+        match_count, match_updated = db.session.query(func.count(Match.id), func.max(Match.updated_at)).one()
+        return f"{ticket_count}:{max_ticket_id}:{last_updated}:{match_count}:{match_updated}"
+
+    def _cache_key(self, user_id: int, message: str, context_messages: List[Dict]) -> str:
+        """Cache key: same user, same question (ignoring case and punctuation), same prior turns, same data"""
+        normalized = ' '.join(_CACHE_KEY_PUNCTUATION.sub(' ', message.lower()).split())
+        context_chain = json.dumps([[m['role'], m['content']] for m in context_messages])
+        raw = f"{user_id}\x00{normalized}\x00{context_chain}\x00{self._data_version()}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def model_router(self, message: str) -> str:
+        """Pick the model for a turn: short lookup questions use the fast model"""
+        if len(message) > FAST_MODEL_MAX_MESSAGE_LENGTH or _OPEN_ENDED_PATTERN.search(message):
+            return self.model
+        return self.fast_model
+
+    def _build_messages(self, message: str, context_messages: List[Dict]) -> List[Dict]:
+        """Prompt for a turn: system prompt, prior turns, then the new question"""
+        # Static content first, volatile turns last, so OpenAI's prompt cache can reuse the prefix
+        messages = [{"role": "system", "content": _SYSTEM_PROMPT}]
+        
+        # Add conversation context
+        for msg in context_messages:
+            messages.append({
+                "role": msg['role'],
+                "content": msg['content']
+            })
+        
+        # Add current user message
+        messages.append({"role": "user", "content": message})
+        return messages
+
+    def _apply_tool_calls(self, user_id: int, messages: List[Dict], content: Optional[str], tool_calls):
+        """Run the model's tool calls and append them and their results to messages.
+
+        Returns (function_name, result). With several tool calls, function_name
+        joins their names and result is the list of their results.
+        """
+        results = self._run_tool_calls(user_id, tool_calls)
+
+        # Feed the tool results back for the final response
+        messages.append({
+            "role": "assistant",
+            "content": content,
+            "tool_calls": [
+                {
+                    "id": tool_call.id,
+                    "type": "function",
+                    "function": {
+                        "name": tool_call.function.name,
+                        "arguments": tool_call.function.arguments
+                    }
+                }
+                for tool_call in tool_calls
+            ]
+        })
+        
+        for tool_call, result in zip(tool_calls, results):
+            messages.append({
+                "role": "tool",
+                "tool_call_id": tool_call.id,
+                # Canonical JSON: identical results give identical prompt bytes
+                "content": json.dumps(_trim_tool_result(result), sort_keys=True, separators=(',', ':'))
+            })
+
+        results = [_client_result(result) for result in results]
+        if len(tool_calls) == 1:
+            return tool_calls[0].function.name, results[0]
+        return ', '.join(tool_call.function.name for tool_call in tool_calls), results
+
+    def _run_function_step(self, user_id: int, message: str, context_messages: List[Dict], model: str):
+        """Build the prompt and run the function-calling hop.
+
+        Returns (messages, response_message, function_name, result). When the model
+        called tools, their results have already been appended to messages so the
+        caller only needs to request the final answer.
+        """
+        messages = self._build_messages(message, context_messages)
+
+        # Call OpenAI with tool calling
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            tools=_TOOLS_SCHEMA,
+            tool_choice="auto",
+            temperature=0.7,
+            max_tokens=1000,
+            extra_body={"prompt_cache_key": _PROMPT_CACHE_KEY}
+        )
+
+        response_message = response.choices[0].message
+
+        if not response_message.tool_calls:
+            return messages, response_message, None, None
+
+        function_name, result = self._apply_tool_calls(
+            user_id, messages, response_message.content, response_message.tool_calls
+        )
+        return messages, response_message, function_name, result
+
+    def _run_tool_calls(self, user_id: int, tool_calls) -> List[Any]:
+        """Execute one turn's tool calls, returning results in call order.
+
+        Identical calls run once, and all get_match_details lookups share a
+        single IN query.
+        """
+        calls = []
+        for tool_call in tool_calls:
+            try:
+                function_args = json.loads(tool_call.function.arguments or '{}')
+            except json.JSONDecodeError:
+                function_args = None
+            calls.append((tool_call.function.name, function_args))
+
+        match_numbers = {
+            args['match_number'] for name, args in calls
+            if name == "get_match_details" and args and 'match_number' in args
+        }
+        matches = self.get_matches_by_numbers(sorted(match_numbers)) if match_numbers else {}
+
+        results = []
+        seen = {}
+        for function_name, function_args in calls:
+            if function_args is None:
+                results.append({"error": f"Invalid arguments for {function_name}"})
+                continue
+            if function_name == "get_match_details" and 'match_number' in function_args:
+                results.append(matches.get(function_args['match_number']))
+                continue
+            key = (function_name, json.dumps(function_args, sort_keys=True))
+            if key not in seen:
+                seen[key] = self._call_function(user_id, function_name, function_args)
+            results.append(seen[key])
+        return results
+
+    def _call_function(self, user_id: int, function_name: str, function_args: Dict[str, Any]) -> Any:
+        """Dispatch a single tool call to its data method"""
+        try:
+            if function_name == "get_tickets_by_filters":
+                return self.get_tickets_by_filters(
+                    user_id, function_args.get('filters'), function_args.get('limit'), function_args.get('offset'),
+                    with_totals=True
+                )
+            elif function_name == "get_friends_attending_match":
+                return self.get_friends_attending_match(
+                    user_id, function_args['match_number'], function_args.get('limit'), function_args.get('offset'),
+                    with_totals=True
+                )
+            elif function_name == "get_weekend_matches":
+                return self.get_weekend_matches(function_args['start_date'], function_args['end_date'])
+            elif function_name == "get_venue_info":
+                return self.get_venue_info(function_args.get('venue'))
+            elif function_name == "get_user_tickets":
+                return self.get_user_tickets(
+                    user_id, function_args.get('limit'), function_args.get('offset'), with_totals=True
+                )
+            elif function_name == "get_match_details":
+                return self.get_match_details(function_args['match_number'])
+            return {"error": f"Unknown function: {function_name}"}
+        except KeyError as e:
+            return {"error": f"Missing argument {e} for {function_name}"}
+
+    def _mock_content(self, message: str) -> str:
+        """Mock response used when no OpenAI API key is configured"""
+        return f"Mock response: I understand you're asking about '{message}'. In a real implementation, I would query your FIFA 2026 ticket data and provide intelligent recommendations. Please set the OPENAI_API_KEY environment variable to enable the full AI assistant functionality."
+
     def process_message(self, user_id: int, message: str, conversation_id: int = None) -> Dict[str, Any]:
         """Process a user message and return LLM response"""
         try:
             # If no OpenAI client, return mock response for testing
             if not self.client:
                 return {
-                    "content": f"Mock response: I understand you're asking about '{message}'. In a real implementation, I would query your FIFA 2026 ticket data and provide intelligent recommendations. Please set the OPENAI_API_KEY environment variable to enable the full AI assistant functionality.",
+                    "content": self._mock_content(message),
                     "function_called": None,
                     "function_result": None,
                     "error": False
                 }
+
             # Get conversation context if conversation_id provided
             context_messages = []
             if conversation_id:
                 context_messages = self.get_conversation_context(conversation_id)
-            
-            # Prepare function definitions for OpenAI
-            functions = [
-                {
-                    "name": "get_tickets_by_filters",
-                    "description": "Query tickets with various filters like venue, date, category, username",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "filters": {
-                                "type": "object",
-                                "properties": {
-                                    "venue": {"type": "string", "description": "Venue name to filter by"},
-                                    "match_number": {"type": "string", "description": "Match number to filter by"},
-                                    "date_from": {"type": "string", "description": "Start date (YYYY-MM-DD)"},
-                                    "date_to": {"type": "string", "description": "End date (YYYY-MM-DD)"},
-                                    "category": {"type": "string", "description": "Ticket category"},
-                                    "username": {"type": "string", "description": "Username to filter by"}
-                                }
-                            }
-                        },
-                        "required": []
-                    }
-                },
-                {
-                    "name": "get_friends_attending_match",
-                    "description": "Find which friends are attending a specific match",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "match_number": {"type": "string", "description": "Match number (e.g., M50)"}
-                        },
-                        "required": ["match_number"]
-                    }
-                },
-                {
-                    "name": "get_weekend_matches",
-                    "description": "Get matches for a specific weekend or date range",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "start_date": {"type": "string", "description": "Start date (YYYY-MM-DD)"},
-                            "end_date": {"type": "string", "description": "End date (YYYY-MM-DD)"}
-                        },
-                        "required": ["start_date", "end_date"]
-                    }
-                },
-                {
-                    "name": "get_venue_info",
-                    "description": "Get information about venues and cities",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "venue": {"type": "string", "description": "Venue name to get info for (optional)"}
-                        },
-                        "required": []
-                    }
-                },
-                {
-                    "name": "get_user_tickets",
-                    "description": "Get all tickets for the current user",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {},
-                        "required": []
-                    }
-                },
-                {
-                    "name": "get_match_details",
-                    "description": "Get details about a specific match",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "match_number": {"type": "string", "description": "Match number (e.g., M50)"}
-                        },
-                        "required": ["match_number"]
-                    }
-                }
-            ]
 
-            # Prepare messages for OpenAI
-            messages = [{"role": "system", "content": self.system_prompt}]
-            
-            # Add conversation context
-            for msg in context_messages:
-                messages.append({
-                    "role": msg['role'],
-                    "content": msg['content']
-                })
-            
-            # Add current user message
-            messages.append({"role": "user", "content": message})
+            cache_key = self._cache_key(user_id, message, context_messages)
+            cached = self.response_cache.get(cache_key)
+            if cached:
+                return dict(cached)
 
-            # Call OpenAI with function calling
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                functions=functions,
-                function_call="auto",
-                temperature=0.7,
-                max_tokens=1000
+            model = self.model_router(message)
+            messages, response_message, function_name, result = self._run_function_step(
+                user_id, message, context_messages, model
             )
 
-            response_message = response.choices[0].message
-
-            # Handle function calls
-            if response_message.function_call:
-                function_name = response_message.function_call.name
-                function_args = json.loads(response_message.function_call.arguments)
-                
-                # Execute the function
-                if function_name == "get_tickets_by_filters":
-                    result = self.get_tickets_by_filters(user_id, function_args.get('filters'))
-                elif function_name == "get_friends_attending_match":
-                    result = self.get_friends_attending_match(user_id, function_args['match_number'])
-                elif function_name == "get_weekend_matches":
-                    result = self.get_weekend_matches(function_args['start_date'], function_args['end_date'])
-                elif function_name == "get_venue_info":
-                    result = self.get_venue_info(function_args.get('venue'))
-                elif function_name == "get_user_tickets":
-                    result = self.get_user_tickets(user_id)
-                elif function_name == "get_match_details":
-                    result = self.get_match_details(function_args['match_number'])
-                else:
-                    result = {"error": f"Unknown function: {function_name}"}
-
-                # Get final response from OpenAI with function result
-                messages.append({
-                    "role": "assistant",
-                    "content": None,
-                    "function_call": {
-                        "name": function_name,
-                        "arguments": response_message.function_call.arguments
-                    }
-                })
-                
-                messages.append({
-                    "role": "function",
-                    "name": function_name,
-                    "content": json.dumps(result)
-                })
-
+            if function_name:
                 # Get final response
+                # Same tools as the first hop so both share a cacheable prefix; none may be called
                 final_response = self.client.chat.completions.create(
-                    model=self.model,
+                    model=model,
                     messages=messages,
+                    tools=_TOOLS_SCHEMA,
+                    tool_choice="none",
                     temperature=0.7,
-                    max_tokens=1000
+                    max_tokens=1000,
+                    extra_body={"prompt_cache_key": _PROMPT_CACHE_KEY}
                 )
                 
-                return {
+                response = {
                     "content": final_response.choices[0].message.content,
                     "function_called": function_name,
                     "function_result": result
                 }
             else:
-                return {
+                response = {
                     "content": response_message.content,
                     "function_called": None,
                     "function_result": None
                 }
 
+            self.response_cache.set(cache_key, response)
+            return response
+
         except Exception as e:
             print(f"Error in process_message: {e}")
             return {
@@ -377,3 +665,99 @@ EXAMPLE QUESTIONS YOU CAN HANDLE:
                 "function_result": None,
                 "error": True
             }
+
+    def process_message_stream(self, user_id: int, message: str, conversation_id: int = None):
+        """Process a user message, yielding the answer incrementally.
+
+        Yields {"type": "delta", "content": ...} events as the answer is generated,
+        then a single {"type": "done", ...} event with the function metadata; a
+        failure ends the stream with {"type": "error", "error": ...} instead. Both
+        hops are streamed: text from the first hop is forwarded as it arrives while
+        any tool-call arguments are accumulated, and after tools run the final
+        answer streams the same way.
+        """
+        try:
+            if not self.client:
+                yield {"type": "delta", "content": self._mock_content(message)}
+                yield {"type": "done", "function_called": None, "function_result": None, "error": False}
+                return
+
+            context_messages = []
+            if conversation_id:
+                context_messages = self.get_conversation_context(conversation_id)
+
+            cache_key = self._cache_key(user_id, message, context_messages)
+            cached = self.response_cache.get(cache_key)
+            if cached:
+                yield {"type": "delta", "content": cached['content']}
+                yield {"type": "done", "function_called": cached['function_called'],
+                       "function_result": cached['function_result'], "error": False}
+                return
+
+            model = self.model_router(message)
+            messages = self._build_messages(message, context_messages)
+
+            content_parts = []
+            tool_call_parts = {}
+            stream = self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                tools=_TOOLS_SCHEMA,
+                tool_choice="auto",
+                temperature=0.7,
+                max_tokens=1000,
+                stream=True,
+                extra_body={"prompt_cache_key": _PROMPT_CACHE_KEY}
+            )
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    content_parts.append(delta.content)
+                    yield {"type": "delta", "content": delta.content}
+                # Tool calls arrive as fragments keyed by index
+                for fragment in delta.tool_calls or []:
+                    part = tool_call_parts.setdefault(fragment.index, {"id": None, "name": "", "arguments": ""})
+                    if fragment.id:
+                        part["id"] = fragment.id
+                    if fragment.function and fragment.function.name:
+                        part["name"] += fragment.function.name
+                    if fragment.function and fragment.function.arguments:
+                        part["arguments"] += fragment.function.arguments
+
+            function_name, result = None, None
+            if tool_call_parts:
+                tool_calls = [
+                    SimpleNamespace(id=part["id"], function=SimpleNamespace(name=part["name"], arguments=part["arguments"]))
+                    for _, part in sorted(tool_call_parts.items())
+                ]
+                function_name, result = self._apply_tool_calls(
+                    user_id, messages, ''.join(content_parts) or None, tool_calls
+                )
+                stream = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    tools=_TOOLS_SCHEMA,
+                    tool_choice="none",
+                    temperature=0.7,
+                    max_tokens=1000,
+                    stream=True,
+                    extra_body={"prompt_cache_key": _PROMPT_CACHE_KEY}
+                )
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        content_parts.append(chunk.choices[0].delta.content)
+                        yield {"type": "delta", "content": chunk.choices[0].delta.content}
+
+            self.response_cache.set(cache_key, {
+                "content": ''.join(content_parts),
+                "function_called": function_name,
+                "function_result": result
+            })
+            yield {"type": "done", "function_called": function_name, "function_result": result, "error": False}
+
+        except Exception as e:
+            print(f"Error in process_message_stream: {e}")
+            # A distinct event, so callers never mistake the error for part of the answer
+            yield {"type": "error", "error": f"I apologize, but I encountered an error processing your request: {str(e)}"}
@@ -11,9 +11,10 @@ The script is idempotent - it can be run multiple times safely.
 import os
 import sys
 import csv
-from datetime import datetime
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+import argparse
+from datetime import date, datetime
+from sqlalchemy import create_engine, func, text
+from sqlalchemy.orm import sessionmaker, load_only
 
 # Add the backend directory to the Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -33,13 +34,19 @@ def load_corrected_schedule():
     
     corrected_matches = {}
     
-    with open(csv_path, 'r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
+    with open(csv_path, 'r', encoding='utf-8', newline='') as file:
+        # Plain csv.reader with column indices resolved once from the header
+        reader = csv.reader(file)
+        header = next(reader)
+        number_col, date_col, venue_col = (
+            header.index('match_number'), header.index('date'), header.index('venue')
+        )
         for row in reader:
-            match_number = row['match_number']
-            corrected_matches[match_number] = {
-                'date': row['date'],
-                'venue': row['venue']
+            if not row:
+                continue
+            corrected_matches[row[number_col]] = {
+                'date': date.fromisoformat(row[date_col]),
+                'venue': row[venue_col]
             }
     
     return corrected_matches
@@ -48,53 +55,51 @@ def backup_database(session):
     """Create a backup of current data before migration"""
     print("📋 Creating backup of current data...")
     
-    # Backup matches
-    matches_backup = session.query(Match).all()
-    matches_data = []
-    for match in matches_backup:
-        matches_data.append({
-            'match_number': match.match_number,
-            'date': match.date,
-            'venue': match.venue
-        })
-    
-    # Backup tickets
-    tickets_backup = session.query(Ticket).all()
-    tickets_data = []
-    for ticket in tickets_backup:
-        tickets_data.append({
-            'id': ticket.id,
-            'match_number': ticket.match_number,
-            'date': ticket.date,
-            'venue': ticket.venue
-        })
-    
-    # Save backup to file
+    matches_count = session.query(func.count(Match.id)).scalar()
+    tickets_count = session.query(func.count(Ticket.id)).scalar()
+    
     backup_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_file = f'match_migration_backup_{backup_timestamp}.txt'
+    backup_prefix = f'match_migration_backup_{backup_timestamp}'
+    connection = session.connection()
+    raw_connection = connection.connection.driver_connection
+    
+    # Stream the tables straight to disk instead of hydrating every row
+    if connection.dialect.name == 'postgresql':
+        backup_files = [f'{backup_prefix}_match.bin', f'{backup_prefix}_ticket.bin']
+        with raw_connection.cursor() as cur:
+            for table, backup_file in zip(('match', 'ticket'), backup_files):
+                with open(backup_file, 'wb') as f:
+                    cur.copy_expert(f"COPY {table} TO STDOUT WITH BINARY", f)
+    else:
+        backup_files = [f'{backup_prefix}.sql']
+        with open(backup_files[0], 'w') as f:
+            for statement in raw_connection.iterdump():
+                f.write(f"{statement}\n")
     
-    with open(backup_file, 'w') as f:
+    # Small human-readable sidecar with the counts
+    with open(f'{backup_prefix}.txt', 'w') as f:
         f.write(f"FIFA Match Schedule Migration Backup - {datetime.now()}\n")
         f.write("=" * 50 + "\n\n")
-        
-        f.write("MATCHES BACKUP:\n")
-        for match in matches_data:
-            f.write(f"{match['match_number']}: {match['date']} at {match['venue']}\n")
-        
-        f.write(f"\nTICKETS BACKUP:\n")
-        for ticket in tickets_data:
-            f.write(f"Ticket {ticket['id']}: {ticket['match_number']} - {ticket['date']} at {ticket['venue']}\n")
+        f.write(f"Matches: {matches_count}\n")
+        f.write(f"Tickets: {tickets_count}\n")
+        f.write(f"Files: {', '.join(backup_files)}\n")
     
-    print(f"✅ Backup saved to: {backup_file}")
-    return len(matches_data), len(tickets_data)
+    print(f"✅ Backup saved to: {', '.join(backup_files)}")
+    return matches_count, tickets_count
 
-def migrate_matches(session, corrected_matches):
-    """Update Match records with corrected data"""
+def migrate_matches(session, corrected_matches, log_lines=None):
+    """Update Match records with corrected data, noting each change in log_lines if given"""
     print("🔄 Updating Match records...")
     
+    # One query for every scheduled match, indexed by match number
+    matches_by_number = {
+        match.match_number: match
+        for match in session.query(Match).filter(Match.match_number.in_(corrected_matches.keys()))
+    }
+    
     updated_matches = 0
     for match_number, corrected_data in corrected_matches.items():
-        match = session.query(Match).filter_by(match_number=match_number).first()
+        match = matches_by_number.get(match_number)
         
         if match:
             old_date = match.date
@@ -105,21 +110,25 @@ def migrate_matches(session, corrected_matches):
                 match.date = corrected_data['date']
                 match.venue = corrected_data['venue']
                 updated_matches += 1
-                print(f"  📝 Updated {match_number}: {old_date} at {old_venue} → {corrected_data['date']} at {corrected_data['venue']}")
+                if log_lines is not None:
+                    log_lines.append(f"  📝 Updated {match_number}: {old_date} at {old_venue} → {corrected_data['date']} at {corrected_data['venue']}")
     
-    session.commit()
     print(f"✅ Updated {updated_matches} Match records")
     return updated_matches
 
-def migrate_tickets(session, corrected_matches):
-    """Update Ticket records with corrected data"""
+def migrate_tickets(session, corrected_matches, log_lines=None):
+    """Update Ticket records with corrected data, noting each change in log_lines if given"""
     print("🎫 Updating Ticket records...")
     
     updated_tickets = 0
-    tickets = session.query(Ticket).all()
+    # Only the columns being compared, only for scheduled matches
+    tickets = session.query(Ticket).options(
+        load_only(Ticket.id, Ticket.match_number, Ticket.date, Ticket.venue)
+    ).filter(Ticket.match_number.in_(corrected_matches.keys())).all()
     
-    for ticket in tickets:
-        if ticket.match_number in corrected_matches:
+    # Changes are flushed together at commit, not piecemeal as the loop runs
+    with session.no_autoflush:
+        for ticket in tickets:
             corrected_data = corrected_matches[ticket.match_number]
             old_date = ticket.date
             old_venue = ticket.venue
@@ -129,9 +138,9 @@ def migrate_tickets(session, corrected_matches):
                 ticket.date = corrected_data['date']
                 ticket.venue = corrected_data['venue']
                 updated_tickets += 1
-                print(f"  🎫 Updated Ticket {ticket.id} ({ticket.match_number}): {old_date} at {old_venue} → {corrected_data['date']} at {corrected_data['venue']}")
+                if log_lines is not None:
+                    log_lines.append(f"  🎫 Updated Ticket {ticket.id} ({ticket.match_number}): {old_date} at {old_venue} → {corrected_data['date']} at {corrected_data['venue']}")
     
-    session.commit()
     print(f"✅ Updated {updated_tickets} Ticket records")
     return updated_tickets
 
@@ -141,17 +150,25 @@ def verify_migration(session, corrected_matches):
     
     verification_errors = []
     
-    # Check matches
+    # Check matches - one query, diffed against the schedule
+    found = {
+        row.match_number: row
+        for row in session.query(Match.match_number, Match.date, Match.venue).filter(
+            Match.match_number.in_(corrected_matches.keys())
+        )
+    }
     for match_number, expected_data in corrected_matches.items():
-        match = session.query(Match).filter_by(match_number=match_number).first()
+        match = found.get(match_number)
         if match:
             if match.date != expected_data['date'] or match.venue != expected_data['venue']:
                 verification_errors.append(f"Match {match_number}: Expected {expected_data['date']} at {expected_data['venue']}, got {match.date} at {match.venue}")
         else:
             verification_errors.append(f"Match {match_number}: Not found in database")
     
-    # Check tickets
-    tickets = session.query(Ticket).all()
+    # Check tickets - only the columns being compared, only for scheduled matches
+    tickets = session.query(Ticket.id, Ticket.match_number, Ticket.date, Ticket.venue).filter(
+        Ticket.match_number.in_(corrected_matches.keys())
+    )
     for ticket in tickets:
         if ticket.match_number in corrected_matches:
             expected_data = corrected_matches[ticket.match_number]
@@ -169,6 +186,10 @@ def verify_migration(session, corrected_matches):
 
 def main():
     """Main migration function"""
+    parser = argparse.ArgumentParser(description="Migrate match dates and venues to the corrected schedule")
+    parser.add_argument('--verbose', action='store_true', help="list every updated match and ticket")
+    args = parser.parse_args()
+    
     print("🚀 FIFA 2026 Match Schedule Migration")
     print("=" * 40)
     
@@ -182,10 +203,18 @@ def main():
         database_url = get_database_url()
         print(f"🔗 Connecting to database: {database_url}")
         
-        if database_url.startswith('sqlite'):
-            engine = create_engine(database_url)
-        else:
-            engine = create_engine(database_url)
+        engine_options = {}
+        if database_url.startswith('postgres://'):
+            database_url = database_url.replace('postgres://', 'postgresql://', 1)
+        if database_url.startswith('postgresql://'):
+            database_url = database_url.replace('postgresql://', 'postgresql+psycopg2://', 1)
+        if database_url.startswith('postgresql+psycopg2://'):
+            # Flush the changed rows as batched UPDATEs instead of one round trip per row
+            engine_options = {
+                'executemany_mode': 'values_plus_batch',
+                'executemany_batch_page_size': 200,
+            }
+        engine = create_engine(database_url, **engine_options)
         
         Session = sessionmaker(bind=engine)
         session = Session()
@@ -194,18 +223,25 @@ def main():
         matches_count, tickets_count = backup_database(session)
         print(f"📊 Found {matches_count} matches and {tickets_count} tickets in database")
         
-        # Perform migration
-        updated_matches = migrate_matches(session, corrected_matches)
-        updated_tickets = migrate_tickets(session, corrected_matches)
+        # Perform migration - one transaction, committed only once verified
+        # Per-row changes are buffered and written once, after the commit
+        log_lines = [] if args.verbose else None
+        updated_matches = migrate_matches(session, corrected_matches, log_lines)
+        updated_tickets = migrate_tickets(session, corrected_matches, log_lines)
         
         # Verify migration
         if verify_migration(session, corrected_matches):
+            session.commit()
+            if log_lines:
+                sys.stdout.write('\n'.join(log_lines) + '\n')
+                sys.stdout.flush()
             print("\n🎉 Migration completed successfully!")
             print(f"📈 Summary:")
             print(f"  - Updated {updated_matches} Match records")
             print(f"  - Updated {updated_tickets} Ticket records")
             print(f"  - Total matches in schedule: {len(corrected_matches)}")
         else:
+            session.rollback()
             print("\n❌ Migration verification failed!")
             sys.exit(1)
             
@@ -213,6 +249,8 @@ def main():
         print(f"\n💥 Migration failed: {str(e)}")
         import traceback
         traceback.print_exc()
+        if 'session' in locals():
+            session.rollback()
         sys.exit(1)
     
     finally:
@@ -1,9 +1,52 @@
+import sys
+from functools import lru_cache
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select, func
+from sqlalchemy.orm import column_property
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, timezone
 
 db = SQLAlchemy()
 
+def utcnow():
+    """Current UTC time as a naive datetime, the form the DateTime columns store
+
+    Replaces the deprecated datetime.utcnow(); values and API formats are unchanged.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# Werkzeug's scrypt (n=2**15) verifies in ~0.1s; older pbkdf2 hashes take several times that
+PASSWORD_HASH_METHOD = 'scrypt'
+
+
+def _run_hash(fn, *args):
+    """Run a password hash function, off the event loop when under gevent workers
+
+    hashlib releases the GIL, but a gevent worker is a single OS thread, so hashing
+    inline would stall every other request on that worker for the whole hash.
+    """
+    monkey = sys.modules.get('gevent.monkey')
+    if monkey is not None and monkey.is_module_patched('socket'):
+        from gevent import get_hub
+        return get_hub().threadpool.apply(fn, args)
+    return fn(*args)
+
+
+@lru_cache(maxsize=1)
+def _dummy_password_hash():
+    """Hash verified against when a login names an unknown user, so a miss costs the same
+    single hash as a wrong password - no timing signal for which usernames exist.
+
+    Built on first use, not at import, so processes that never see a login skip the hash.
+    """
+    return _run_hash(generate_password_hash, 'dummy-password', PASSWORD_HASH_METHOD)
+
+
+def check_password_for_missing_user(password):
+    """Spend one hash verification on a login for a nonexistent user; always False"""
+    _run_hash(check_password_hash, _dummy_password_hash(), password)
+    return False
+
 class Match(db.Model):
     """FIFA 2026 Match Schedule Lookup Table"""
     id = db.Column(db.Integer, primary_key=True)
@@ -12,11 +55,20 @@ class Match(db.Model):
     venue = db.Column(db.String(100), nullable=False)
     teams = db.Column(db.String(200), nullable=True)
     match_type = db.Column(db.String(50), nullable=True)
+    # Bumped by every schedule change, so caches keyed on the data can tell
+    updated_at = db.Column(db.DateTime, default=utcnow, onupdate=utcnow)
+    
+    __table_args__ = (
+        # Covers per-venue counts and venue schedules ordered by date
+        db.Index('ix_match_venue_date', 'venue', 'date'),
+        # Date-range lookups (weekend matches)
+        db.Index('ix_match_date', 'date'),
+    )
     
     def to_dict(self):
         return {
             'match_number': self.match_number,
-            'date': self.date.strftime('%Y-%m-%d'),
+            'date': self.date.isoformat(),
             'venue': self.venue,
             'teams': self.teams,
             'match_type': self.match_type
@@ -30,7 +82,7 @@ class User(db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)  # Increased for scrypt hashes
     favorite_team = db.Column(db.String(100), nullable=True)  # FIFA 2026 favorite team
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=utcnow)
     
     # Relationship to tickets
     tickets = db.relationship('Ticket', backref='user', lazy=True, cascade='all, delete-orphan')
@@ -39,10 +91,14 @@ class User(db.Model):
     chat_conversations = db.relationship('ChatConversation', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = _run_hash(generate_password_hash, password, PASSWORD_HASH_METHOD)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return _run_hash(check_password_hash, self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """Whether the stored hash predates the current hashing method"""
+        return not self.password_hash.startswith(f'{PASSWORD_HASH_METHOD}:')
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -60,8 +116,17 @@ class Ticket(db.Model):
     quantity = db.Column(db.Integer, nullable=False)
     ticket_info = db.Column(db.Text)
     ticket_price = db.Column(db.Float, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=utcnow)
+    updated_at = db.Column(db.DateTime, default=utcnow, onupdate=utcnow)
+    
+    __table_args__ = (
+        # Who is attending a match, excluding the current user
+        db.Index('ix_ticket_match_number_user_id', 'match_number', 'user_id'),
+        # A user's own tickets in date order
+        db.Index('ix_ticket_user_id_date', 'user_id', 'date'),
+        # Date ranges and the (date, id) keyset used by ticket pagination
+        db.Index('ix_ticket_date_id', 'date', 'id'),
+    )
     
     def to_dict(self):
         return {
@@ -70,7 +135,7 @@ class Ticket(db.Model):
             'username': self.user.username if self.user else 'Unknown',
             'name': self.name,
             'match_number': self.match_number,
-            'date': self.date.strftime('%Y-%m-%d') if self.date else None,
+            'date': self.date.isoformat() if self.date else None,
             'venue': self.venue,
             'teams': self.teams,
             'match_type': self.match_type,
@@ -78,20 +143,37 @@ class Ticket(db.Model):
             'quantity': self.quantity,
             'ticket_info': self.ticket_info,
             'ticket_price': self.ticket_price,
-            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M') if self.created_at else None,
-            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M') if self.updated_at else None
+            'created_at': self.created_at.isoformat(sep=' ', timespec='minutes') if self.created_at else None,
+            'updated_at': self.updated_at.isoformat(sep=' ', timespec='minutes') if self.updated_at else None
         }
     
     def __repr__(self):
         return f'<Ticket {self.match_number} - {self.name}>'
 
+# Ticket columns plus the owner's username, for list endpoints that serialize rows
+# straight from a projection instead of loading Ticket objects
+TICKET_ROW_COLUMNS = (
+    Ticket.id, Ticket.user_id, User.username, Ticket.name, Ticket.match_number, Ticket.date,
+    Ticket.venue, Ticket.teams, Ticket.match_type, Ticket.ticket_category, Ticket.quantity,
+    Ticket.ticket_info, Ticket.ticket_price, Ticket.created_at, Ticket.updated_at
+)
+
+def ticket_row_to_dict(row):
+    """Same shape as Ticket.to_dict(), built from a TICKET_ROW_COLUMNS row"""
+    ticket = dict(row._mapping)
+    ticket['username'] = ticket['username'] or 'Unknown'
+    ticket['date'] = row.date.isoformat() if row.date else None
+    ticket['created_at'] = row.created_at.isoformat(sep=' ', timespec='minutes') if row.created_at else None
+    ticket['updated_at'] = row.updated_at.isoformat(sep=' ', timespec='minutes') if row.updated_at else None
+    return ticket
+
 class ChatConversation(db.Model):
     """Chat conversation metadata"""
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     title = db.Column(db.String(200), nullable=True)  # Auto-generated or user-set title
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=utcnow)
+    updated_at = db.Column(db.DateTime, default=utcnow, onupdate=utcnow)
     is_saved = db.Column(db.Boolean, default=False)  # Whether user saved this conversation
     
     # Relationship to messages
@@ -102,10 +184,10 @@ class ChatConversation(db.Model):
             'id': self.id,
             'user_id': self.user_id,
             'title': self.title,
-            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M') if self.created_at else None,
-            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M') if self.updated_at else None,
+            'created_at': self.created_at.isoformat(sep=' ', timespec='minutes') if self.created_at else None,
+            'updated_at': self.updated_at.isoformat(sep=' ', timespec='minutes') if self.updated_at else None,
             'is_saved': self.is_saved,
-            'message_count': len(self.messages)
+            'message_count': self.message_count
         }
     
     def __repr__(self):
@@ -117,7 +199,12 @@ class ChatMessage(db.Model):
     conversation_id = db.Column(db.Integer, db.ForeignKey('chat_conversation.id'), nullable=False)
     role = db.Column(db.String(20), nullable=False)  # 'user', 'assistant', 'system'
     content = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=utcnow)
+    
+    __table_args__ = (
+        # Latest turns of a conversation
+        db.Index('ix_chat_message_conversation_id_id', 'conversation_id', 'id'),
+    )
     
     def to_dict(self):
         return {
@@ -125,8 +212,18 @@ class ChatMessage(db.Model):
             'conversation_id': self.conversation_id,
             'role': self.role,
             'content': self.content,
-            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
+            'created_at': self.created_at.isoformat(sep=' ', timespec='seconds') if self.created_at else None
         }
     
     def __repr__(self):
         return f'<ChatMessage {self.id} - {self.role}>'
+
+# Counted in SQL so serializing a conversation never hydrates its messages;
+# deferred, so list endpoints opt in with undefer() to fetch it in one query
+ChatConversation.message_count = column_property(
+    select(func.count(ChatMessage.id))
+    .where(ChatMessage.conversation_id == ChatConversation.id)
+    .correlate_except(ChatMessage)
+    .scalar_subquery(),
+    deferred=True,
+)
@@ -7,13 +7,60 @@ This script is designed to run on Railway production environment
 import os
 import sys
 import csv
+import argparse
+from collections import Counter
+from datetime import date
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+
+# match.updated_at is added by the app at startup; databases that predate it get it here
+# so the UPDATEs below can set it without the app having run first
+ADD_MATCH_UPDATED_AT_SQL = "ALTER TABLE match ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP"
+# One statement per table: join the corrected schedule in as a VALUES list. updated_at is
+# bumped so the ticket list ETag and the chat answer cache see the change
+UPDATE_MATCHES_SQL = """
+    UPDATE match
+    SET date = v.date, venue = v.venue, updated_at = now() AT TIME ZONE 'utc'
+    FROM (VALUES %s) AS v(match_number, date, venue)
+    WHERE match.match_number = v.match_number
+    RETURNING match.match_number, match.date, match.venue
+"""
+UPDATE_TICKETS_SQL = """
+    UPDATE ticket
+    SET date = v.date, venue = v.venue, updated_at = now() AT TIME ZONE 'utc'
+    FROM (VALUES %s) AS v(match_number, date, venue)
+    WHERE ticket.match_number = v.match_number
+    RETURNING ticket.match_number
+"""
+# Verification returns only rows that still disagree with the schedule
+VERIFY_MATCHES_SQL = """
+    SELECT v.match_number, v.date AS expected_date, v.venue AS expected_venue,
+           m.match_number AS found, m.date, m.venue
+    FROM (VALUES %s) AS v(match_number, date, venue)
+    LEFT JOIN match m ON m.match_number = v.match_number
+    WHERE m.match_number IS NULL OR m.date <> v.date OR m.venue <> v.venue
+"""
+VERIFY_TICKETS_SQL = """
+    SELECT t.id, t.match_number, v.date AS expected_date, v.venue AS expected_venue, t.date, t.venue
+    FROM (VALUES %s) AS v(match_number, date, venue)
+    JOIN ticket t ON t.match_number = v.match_number
+    WHERE t.date <> v.date OR t.venue <> v.venue
+"""
+# Row template for the VALUES list above, shared by every statement; dates
+# arrive as datetime.date, which psycopg2 already sends as a typed date literal
+VALUES_TEMPLATE = "(%s, %s, %s)"
 
 def get_database_url():
     """Get database URL from environment variable"""
     return os.environ.get('DATABASE_URL')
 
+def get_connect_options():
+    """Get psycopg2 connect options from environment variables"""
+    return {
+        'connect_timeout': int(os.environ.get('PGCONNECT_TIMEOUT', 10)),
+        'application_name': 'production_migration',
+    }
+
 def load_corrected_schedule():
     """Load the corrected match schedule from CSV"""
     csv_path = os.path.join(os.path.dirname(__file__), 'data', 'fifa_match_schedule.csv')
@@ -23,19 +70,29 @@ def load_corrected_schedule():
     
     corrected_matches = {}
     
-    with open(csv_path, 'r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
+    with open(csv_path, 'r', encoding='utf-8', newline='') as file:
+        # Plain csv.reader with column indices resolved once from the header
+        reader = csv.reader(file)
+        header = next(reader)
+        number_col, date_col, venue_col = (
+            header.index('match_number'), header.index('date'), header.index('venue')
+        )
         for row in reader:
-            match_number = row['match_number']
-            corrected_matches[match_number] = {
-                'date': row['date'],
-                'venue': row['venue']
+            if not row:
+                continue
+            corrected_matches[row[number_col]] = {
+                'date': date.fromisoformat(row[date_col]),
+                'venue': row[venue_col]
             }
     
     return corrected_matches
 
 def main():
     """Main migration function"""
+    parser = argparse.ArgumentParser(description="Migrate production match dates and venues to the corrected schedule")
+    parser.add_argument('--verbose', action='store_true', help="list every updated match and ticket")
+    args = parser.parse_args()
+    
     print("🚀 FIFA 2026 Match Schedule Production Migration")
     print("=" * 50)
     
@@ -55,9 +112,14 @@ def main():
         print(f"🔗 Connecting to production database...")
         
         # Connect to PostgreSQL
-        conn = psycopg2.connect(database_url)
+        conn = psycopg2.connect(database_url, **get_connect_options())
         
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            # One-shot, idempotent migration in a single transaction: skip waiting for the
+            # WAL flush at commit and let the backup copies run without a statement timeout
+            cur.execute("SET LOCAL synchronous_commit = off")
+            cur.execute("SET LOCAL statement_timeout = 0")
+            
             # Check current matches
             cur.execute("SELECT COUNT(*) as count FROM match")
             match_count = cur.fetchone()['count']
@@ -79,46 +141,40 @@ def main():
                 SELECT * FROM ticket
             """)
             
+            schedule_rows = [
+                (match_number, corrected_data['date'], corrected_data['venue'])
+                for match_number, corrected_data in corrected_matches.items()
+            ]
+            
             # Update matches
             print("🔄 Updating Match records...")
-            updated_matches = 0
-            for match_number, corrected_data in corrected_matches.items():
-                cur.execute("""
-                    UPDATE match 
-                    SET date = %s, venue = %s 
-                    WHERE match_number = %s
-                """, (corrected_data['date'], corrected_data['venue'], match_number))
-                
-                if cur.rowcount > 0:
-                    updated_matches += 1
-                    print(f"  📝 Updated {match_number}: {corrected_data['date']} at {corrected_data['venue']}")
+            cur.execute(ADD_MATCH_UPDATED_AT_SQL)
+            match_rows = execute_values(cur, UPDATE_MATCHES_SQL, schedule_rows,
+                                        template=VALUES_TEMPLATE, page_size=500, fetch=True)
+            updated_matches = len(match_rows)
             
             # Update tickets
             print("🎫 Updating Ticket records...")
-            updated_tickets = 0
-            for match_number, corrected_data in corrected_matches.items():
-                cur.execute("""
-                    UPDATE ticket 
-                    SET date = %s, venue = %s 
-                    WHERE match_number = %s
-                """, (corrected_data['date'], corrected_data['venue'], match_number))
-                
-                if cur.rowcount > 0:
-                    updated_tickets += cur.rowcount
-                    print(f"  🎫 Updated {cur.rowcount} tickets for {match_number}")
+            ticket_rows = execute_values(cur, UPDATE_TICKETS_SQL, schedule_rows,
+                                         template=VALUES_TEMPLATE, page_size=500, fetch=True)
+            updated_tickets = len(ticket_rows)
             
             # Verify migration
             print("🔍 Verifying migration...")
             verification_errors = []
             
-            for match_number, expected_data in corrected_matches.items():
-                cur.execute("SELECT date, venue FROM match WHERE match_number = %s", (match_number,))
-                result = cur.fetchone()
-                if result:
-                    if result['date'].strftime('%Y-%m-%d') != expected_data['date'] or result['venue'] != expected_data['venue']:
-                        verification_errors.append(f"Match {match_number}: Expected {expected_data['date']} at {expected_data['venue']}, got {result['date']} at {result['venue']}")
+            mismatches = execute_values(cur, VERIFY_MATCHES_SQL, schedule_rows,
+                                        template=VALUES_TEMPLATE, page_size=500, fetch=True)
+            for row in mismatches:
+                if row['found'] is None:
+                    verification_errors.append(f"Match {row['match_number']}: Not found in database")
                 else:
-                    verification_errors.append(f"Match {match_number}: Not found in database")
+                    verification_errors.append(f"Match {row['match_number']}: Expected {row['expected_date']} at {row['expected_venue']}, got {row['date']} at {row['venue']}")
+            
+            mismatches = execute_values(cur, VERIFY_TICKETS_SQL, schedule_rows,
+                                        template=VALUES_TEMPLATE, page_size=500, fetch=True)
+            for row in mismatches:
+                verification_errors.append(f"Ticket {row['id']} ({row['match_number']}): Expected {row['expected_date']} at {row['expected_venue']}, got {row['date']} at {row['venue']}")
             
             if verification_errors:
                 print("❌ Verification failed:")
@@ -133,6 +189,17 @@ def main():
             # Commit changes
             conn.commit()
             
+            # Per-row changes are written once, after the commit
+            if args.verbose:
+                log_lines = [f"  📝 Updated {row['match_number']}: {row['date']} at {row['venue']}" for row in match_rows]
+                log_lines.extend(
+                    f"  🎫 Updated {count} tickets for {match_number}"
+                    for match_number, count in sorted(Counter(row['match_number'] for row in ticket_rows).items())
+                )
+                if log_lines:
+                    sys.stdout.write('\n'.join(log_lines) + '\n')
+                    sys.stdout.flush()
+            
             print(f"✅ Updated {updated_matches} Match records")
             print(f"✅ Updated {updated_tickets} Ticket records")
             print("\n🎉 Production migration completed successfully!")
@@ -6,91 +6,99 @@ Test date consistency across all layers: CSV → Database → API → Frontend
 import os
 import sys
 import csv
+import time
+import shutil
+import tempfile
 import requests
 from datetime import datetime
 
+# Matches checked by every test: the tuple keeps report order, the set is for lookups
+TEST_MATCHES = ('M73', 'M101', 'M102', 'M103')
+TEST_MATCH_SET = frozenset(TEST_MATCHES)
+
+CSV_PATH = os.path.join(os.path.dirname(__file__), 'data', 'fifa_match_schedule.csv')
+
+# One keep-alive session so every request after the first skips the TCP/TLS handshake
+http = requests.Session()
+
 def test_csv_data():
     """Test CSV data for key matches"""
     print("🔍 Testing CSV Data...")
-    csv_path = os.path.join(os.path.dirname(__file__), 'data', 'fifa_match_schedule.csv')
-    
-    test_matches = ['M73', 'M101', 'M102', 'M103']
     csv_data = {}
     
-    with open(csv_path, 'r') as f:
-        reader = csv.DictReader(f)
+    with open(CSV_PATH, 'r', newline='') as f:
+        # Plain csv.reader with column indices resolved once from the header
+        reader = csv.reader(f)
+        header = next(reader)
+        number_col, date_col, venue_col = (
+            header.index('match_number'), header.index('date'), header.index('venue')
+        )
         for row in reader:
-            if row['match_number'] in test_matches:
-                csv_data[row['match_number']] = {
-                    'date': row['date'],
-                    'venue': row['venue']
-                }
+            if row and row[number_col] in TEST_MATCH_SET:
+                csv_data[row[number_col]] = (row[date_col], row[venue_col])
+                # Stop reading once every match under test has been found
+                if len(csv_data) == len(TEST_MATCH_SET):
+                    break
     
-    for match in test_matches:
+    for match in TEST_MATCHES:
         if match in csv_data:
-            print(f"  ✅ {match}: {csv_data[match]['date']} at {csv_data[match]['venue']}")
+            print(f"  ✅ {match}: {csv_data[match][0]} at {csv_data[match][1]}")
         else:
             print(f"  ❌ {match}: Not found in CSV")
     
     return csv_data
 
-def test_api_data():
-    """Test API data for key matches"""
-    print("\n🔍 Testing API Data...")
-    
+def fetch_api_matches():
+    """Fetch all matches from the API once, shared by the API tests"""
     try:
-        response = requests.get("https://fifa-tickets-app-production.up.railway.app/api/matches")
+        response = http.get("https://fifa-tickets-app-production.up.railway.app/api/matches", timeout=10)
         if response.status_code == 200:
-            matches = response.json()
-            api_data = {}
-            
-            for match in matches:
-                if match['match_number'] in ['M73', 'M101', 'M102', 'M103']:
-                    api_data[match['match_number']] = {
-                        'date': match['date'],
-                        'venue': match['venue']
-                    }
-            
-            for match in ['M73', 'M101', 'M102', 'M103']:
-                if match in api_data:
-                    print(f"  ✅ {match}: {api_data[match]['date']} at {api_data[match]['venue']}")
-                else:
-                    print(f"  ❌ {match}: Not found in API")
-            
-            return api_data
-        else:
-            print(f"  ❌ API request failed: {response.status_code}")
-            return {}
+            return response.json()
+        print(f"  ❌ API request failed: {response.status_code}")
     except Exception as e:
         print(f"  ❌ API request error: {e}")
+    return None
+
+def test_api_data(matches):
+    """Test API data for key matches, as fetched by fetch_api_matches"""
+    if matches is None:
         return {}
+    
+    api_data = {}
+    for match in matches:
+        if match['match_number'] in TEST_MATCH_SET:
+            api_data[match['match_number']] = (match['date'], match['venue'])
+    
+    for match in TEST_MATCHES:
+        if match in api_data:
+            print(f"  ✅ {match}: {api_data[match][0]} at {api_data[match][1]}")
+        else:
+            print(f"  ❌ {match}: Not found in API")
+    
+    return api_data
 
 def test_date_consistency(csv_data, api_data):
     """Test consistency between CSV and API data"""
     print("\n🔍 Testing Date Consistency...")
     
-    test_matches = ['M73', 'M101', 'M102', 'M103']
     all_consistent = True
     
-    for match in test_matches:
-        if match in csv_data and match in api_data:
-            csv_date = csv_data[match]['date']
-            api_date = api_data[match]['date']
-            csv_venue = csv_data[match]['venue']
-            api_venue = api_data[match]['venue']
-            
-            if csv_date == api_date and csv_venue == api_venue:
-                print(f"  ✅ {match}: CSV and API data match ({csv_date} at {csv_venue})")
-            else:
-                print(f"  ❌ {match}: CSV ({csv_date} at {csv_venue}) ≠ API ({api_date} at {api_venue})")
-                all_consistent = False
-        else:
+    # Both sides are (date, venue) tuples, so one comparison covers both fields
+    for match in TEST_MATCHES:
+        csv_entry = csv_data.get(match)
+        api_entry = api_data.get(match)
+        if csv_entry is None or api_entry is None:
             print(f"  ❌ {match}: Missing data in CSV or API")
             all_consistent = False
+        elif csv_entry == api_entry:
+            print(f"  ✅ {match}: CSV and API data match ({csv_entry[0]} at {csv_entry[1]})")
+        else:
+            print(f"  ❌ {match}: CSV ({csv_entry[0]} at {csv_entry[1]}) ≠ API ({api_entry[0]} at {api_entry[1]})")
+            all_consistent = False
     
     return all_consistent
 
-def test_timezone_issues():
+def test_timezone_issues(matches):
     """Test for common timezone issues"""
     print("\n🔍 Testing for Timezone Issues...")
     
@@ -102,23 +110,80 @@ def test_timezone_issues():
         ('M103', '2026-07-18', 'Should be July 18, 2026'),
     ]
     
+    if matches is None:
+        print("  ❌ Error testing timezone issues: no API data")
+        return
+    
+    match_dict = {m['match_number']: m for m in matches}
+    
+    for match_num, expected_date, description in test_cases:
+        if match_num in match_dict:
+            actual_date = match_dict[match_num]['date']
+            if actual_date == expected_date:
+                print(f"  ✅ {match_num}: {actual_date} - {description}")
+            else:
+                print(f"  ❌ {match_num}: Expected {expected_date}, got {actual_date} - {description}")
+        else:
+            print(f"  ❌ {match_num}: Not found in API")
+
+def test_ticket_date_validation():
+    """Test the World Cup date window on ticket creation, including non-zero-padded dates"""
+    print("\n🔍 Testing Ticket Date Validation...")
+    
+    # The app binds its database at import, so it must not be loaded yet - otherwise this
+    # would write to whatever DATABASE_URL it was loaded with, possibly production
+    if 'app' in sys.modules:
+        print("  ⚠️  Skipped: app is already imported with another database")
+        return True
+    
+    # Run against a throwaway SQLite file, never the DATABASE_URL this script checks
+    temp_dir = tempfile.mkdtemp()
+    original_url = os.environ.get('DATABASE_URL')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(temp_dir, 'date_validation.db')}"
     try:
-        response = requests.get("https://fifa-tickets-app-production.up.railway.app/api/matches")
-        if response.status_code == 200:
-            matches = response.json()
-            match_dict = {m['match_number']: m for m in matches}
-            
-            for match_num, expected_date, description in test_cases:
-                if match_num in match_dict:
-                    actual_date = match_dict[match_num]['date']
-                    if actual_date == expected_date:
-                        print(f"  ✅ {match_num}: {actual_date} - {description}")
-                    else:
-                        print(f"  ❌ {match_num}: Expected {expected_date}, got {actual_date} - {description}")
-                else:
-                    print(f"  ❌ {match_num}: Not found in API")
-    except Exception as e:
-        print(f"  ❌ Error testing timezone issues: {e}")
+        from app import app
+        from models import db, User
+    finally:
+        if original_url is None:
+            os.environ.pop('DATABASE_URL', None)
+        else:
+            os.environ['DATABASE_URL'] = original_url
+    
+    client = app.test_client()
+    credentials = {'username': f'testuser_dates_{int(time.time())}', 'password': 'testpass123'}
+    
+    # (submitted date, expected status, description)
+    test_cases = [
+        ('2026-06-5', 400, 'June 5 is before the tournament, even unpadded'),
+        ('2026-6-15', 201, 'June 15 is inside the tournament, even unpadded'),
+    ]
+    
+    all_passed = True
+    try:
+        token = client.post('/api/auth/register', json=credentials).get_json()['token']
+        headers = {'Authorization': f'Bearer {token}'}
+        for submitted, expected_status, description in test_cases:
+            ticket = {
+                'name': 'Date check', 'match_number': 'M1', 'date': submitted,
+                'venue': 'Test venue', 'ticket_category': 'Category 1', 'quantity': 1
+            }
+            response = client.post('/api/tickets', json=ticket, headers=headers)
+            if response.status_code == expected_status:
+                print(f"  ✅ {submitted}: {response.status_code} - {description}")
+            else:
+                print(f"  ❌ {submitted}: Expected {expected_status}, got {response.status_code} - {description}")
+                all_passed = False
+    finally:
+        # Remove the test user (its tickets go with it) and the throwaway database
+        with app.app_context():
+            user = User.query.filter_by(username=credentials['username']).first()
+            if user:
+                db.session.delete(user)
+                db.session.commit()
+            db.engine.dispose()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    return all_passed
 
 def main():
     """Main test function"""
@@ -128,18 +193,23 @@ def main():
     # Test CSV data
     csv_data = test_csv_data()
     
-    # Test API data
-    api_data = test_api_data()
+    # Test API data - fetched once and shared with the timezone checks
+    print("\n🔍 Testing API Data...")
+    matches = fetch_api_matches()
+    api_data = test_api_data(matches)
     
     # Test consistency
     is_consistent = test_date_consistency(csv_data, api_data)
     
     # Test for timezone issues
-    test_timezone_issues()
+    test_timezone_issues(matches)
+    
+    # Test ticket date validation
+    dates_valid = test_ticket_date_validation()
     
     # Summary
     print("\n" + "=" * 50)
-    if is_consistent:
+    if is_consistent and dates_valid:
         print("🎉 All tests passed! Date consistency is maintained across all layers.")
         print("✅ CSV → API data flow is working correctly")
         print("✅ No timezone conversion issues detected")
@@ -6,17 +6,19 @@ This script is designed to run inside the Docker container with PostgreSQL.
 
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-# Add the backend directory to the path
+# Add the backend directory to the path; the app itself is imported only by the
+# functions that need it, so importing this module doesn't build the Flask app
 sys.path.append('/app')
 
-from app import app
-from llm_service import LLMService
-from models import db, User, Ticket, Match, ChatConversation, ChatMessage, SQLQueryLog
-
 def setup_test_data():
     """Set up test data for the chatbot tests"""
+    from sqlalchemy import insert, text
+    from app import app
+    from models import db, User, Ticket, Match
+    
     print("🔧 Setting up test data...")
     
     with app.app_context():
@@ -29,22 +31,33 @@ def setup_test_data():
             {'username': 'bob_jones', 'password': 'password123'}
         ]
         
+        # One lookup for every test username, then create only the missing ones
+        existing = {
+            username for (username,) in db.session.query(User.username).filter(
+                User.username.in_([user_data['username'] for user_data in test_users])
+            )
+        }
+        new_users = []
         for user_data in test_users:
-            user = User.query.filter_by(username=user_data['username']).first()
-            if not user:
+            if user_data['username'] not in existing:
                 user = User(username=user_data['username'])
                 user.set_password(user_data['password'])
-                db.session.add(user)
-        
-        db.session.commit()
+                new_users.append(user)
+        db.session.bulk_save_objects(new_users)
         
         # Create test tickets
         users = User.query.all()
         matches = Match.query.limit(5).all()
         
         if users and matches:
-            # Clear existing tickets for clean test
-            Ticket.query.delete()
+            # Clear existing tickets for clean test - never against production
+            if os.environ.get('FLASK_ENV') == 'production':
+                raise RuntimeError("Refusing to clear tickets with FLASK_ENV=production")
+            if db.engine.dialect.name == 'postgresql':
+                # Drops the table's files instead of deleting and logging every row
+                db.session.execute(text('TRUNCATE TABLE ticket RESTART IDENTITY'))
+            else:
+                Ticket.query.delete()
             
             test_tickets = [
                 {'user': users[0], 'match': matches[0], 'name': 'John Doe', 'quantity': 2, 'venue': 'New York/New Jersey'},
@@ -57,32 +70,45 @@ def setup_test_data():
                 {'user': users[2], 'match': matches[3], 'name': 'Mike Wilson', 'quantity': 2, 'venue': 'Boston'},
             ]
             
-            for ticket_data in test_tickets:
-                ticket = Ticket(
-                    user_id=ticket_data['user'].id,
-                    name=ticket_data['name'],
-                    match_number=ticket_data['match'].match_number,
-                    date=ticket_data['match'].date,
-                    venue=ticket_data['venue'],
-                    ticket_category='General',
-                    quantity=ticket_data['quantity'],
-                    ticket_info='Test ticket'
-                )
-                db.session.add(ticket)
-            
-            db.session.commit()
+            # Plain dicts through one Core INSERT, sent to the driver as a single batch
+            db.session.execute(insert(Ticket), [
+                {
+                    'user_id': ticket_data['user'].id,
+                    'name': ticket_data['name'],
+                    'match_number': ticket_data['match'].match_number,
+                    'date': ticket_data['match'].date,
+                    'venue': ticket_data['venue'],
+                    'ticket_category': 'General',
+                    'quantity': ticket_data['quantity'],
+                    'ticket_info': 'Test ticket'
+                }
+                for ticket_data in test_tickets
+            ])
             print(f"✅ Created {len(test_tickets)} test tickets")
         else:
             print("⚠️  No users or matches found for test data")
+        
+        # Users and tickets land in one transaction
+        db.session.commit()
 
-def test_query(llm_service, user_id, question, expected_function=None):
-    """Test a single query and print results"""
+def process_in_app_context(llm_service, user_id, question):
+    """Run a query in its own app context, so it can run on a worker thread"""
+    from app import app
+    
+    with app.app_context():
+        return llm_service.process_message(user_id, question)
+
+def test_query(llm_service, user_id, question, expected_function=None, future=None):
+    """Test a single query and print results, waiting on future if it is already running"""
     print(f"\n{'='*60}")
     print(f"❓ QUESTION: {question}")
     print(f"{'='*60}")
     
     try:
-        response = llm_service.process_message(user_id, question)
+        if future is not None:
+            response = future.result()
+        else:
+            response = llm_service.process_message(user_id, question)
         
         print(f"🤖 RESPONSE: {response['content']}")
         
@@ -107,6 +133,10 @@ def test_query(llm_service, user_id, question, expected_function=None):
 
 def run_tests():
     """Run all the test queries"""
+    from app import app
+    from llm_service import LLMService
+    from models import User
+    
     print("🚀 Starting FIFA 2026 Chatbot Tests (Docker Environment)")
     print(f"⏰ Test started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"🗄️  Database: {os.environ.get('DATABASE_URL', 'SQLite (local)')}")
@@ -158,15 +188,22 @@ def run_tests():
             }
         ]
         
+        # The queries are independent, so their OpenAI round trips overlap; results
+        # are still reported in order. The DB pool must allow max_workers connections.
         results = []
-        for i, test in enumerate(test_queries, 1):
-            print(f"\n🧪 TEST {i}: {test['description']}")
-            result = test_query(llm_service, user_id, test['question'], test['expected_function'])
-            results.append({
-                'test': test,
-                'result': result,
-                'success': result is not None and not result.get('error', False)
-            })
+        with ThreadPoolExecutor(max_workers=len(test_queries)) as executor:
+            futures = [
+                executor.submit(process_in_app_context, llm_service, user_id, test['question'])
+                for test in test_queries
+            ]
+            for i, (test, future) in enumerate(zip(test_queries, futures), 1):
+                print(f"\n🧪 TEST {i}: {test['description']}")
+                result = test_query(llm_service, user_id, test['question'], test['expected_function'], future)
+                results.append({
+                    'test': test,
+                    'result': result,
+                    'success': result is not None and not result.get('error', False)
+                })
         
         # Summary
         print(f"\n{'='*60}")
@@ -184,13 +221,6 @@ def run_tests():
             print(f"{status} Test {i}: {result['test']['description']}")
         
         print(f"\n⏰ Test completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        
-        # Check SQL logs
-        sql_logs = SQLQueryLog.query.filter_by(user_id=user_id).all()
-        if sql_logs:
-            print(f"\n📝 SQL Query Logs: {len(sql_logs)} queries logged")
-            for log in sql_logs[-3:]:  # Show last 3
-                print(f"   - {log.question[:50]}... -> {log.result_count} results")
 
 if __name__ == "__main__":
     setup_test_data()
@@ -8,15 +8,16 @@ import os
 import sys
 from datetime import datetime
 
-# Add the backend directory to the path
+# Add the backend directory to the path; the app itself is imported only by the
+# functions that need it, so importing this module doesn't build the Flask app
 sys.path.append('/app')
 
-from app import app
-from llm_service import LLMService
-from models import db, User, Ticket, Match, ChatConversation, ChatMessage, SQLQueryLog
-
 def setup_test_data():
     """Set up test data for the chatbot tests"""
+    from sqlalchemy import insert, text
+    from app import app
+    from models import db, User, Ticket, Match
+    
     print("🔧 Setting up test data...")
     
     with app.app_context():
@@ -29,22 +30,33 @@ def setup_test_data():
             {'username': 'bob_jones', 'password': 'password123'}
         ]
         
+        # One lookup for every test username, then create only the missing ones
+        existing = {
+            username for (username,) in db.session.query(User.username).filter(
+                User.username.in_([user_data['username'] for user_data in test_users])
+            )
+        }
+        new_users = []
         for user_data in test_users:
-            user = User.query.filter_by(username=user_data['username']).first()
-            if not user:
+            if user_data['username'] not in existing:
                 user = User(username=user_data['username'])
                 user.set_password(user_data['password'])
-                db.session.add(user)
-        
-        db.session.commit()
+                new_users.append(user)
+        db.session.bulk_save_objects(new_users)
         
         # Create test tickets
         users = User.query.all()
         matches = Match.query.limit(5).all()
         
         if users and matches:
-            # Clear existing tickets for clean test
-            Ticket.query.delete()
+            # Clear existing tickets for clean test - never against production
+            if os.environ.get('FLASK_ENV') == 'production':
+                raise RuntimeError("Refusing to clear tickets with FLASK_ENV=production")
+            if db.engine.dialect.name == 'postgresql':
+                # Drops the table's files instead of deleting and logging every row
+                db.session.execute(text('TRUNCATE TABLE ticket RESTART IDENTITY'))
+            else:
+                Ticket.query.delete()
             
             test_tickets = [
                 {'user': users[0], 'match': matches[0], 'name': 'John Doe', 'quantity': 2, 'venue': 'New York/New Jersey'},
@@ -57,23 +69,26 @@ def setup_test_data():
                 {'user': users[2], 'match': matches[3], 'name': 'Mike Wilson', 'quantity': 2, 'venue': 'Boston'},
             ]
             
-            for ticket_data in test_tickets:
-                ticket = Ticket(
-                    user_id=ticket_data['user'].id,
-                    name=ticket_data['name'],
-                    match_number=ticket_data['match'].match_number,
-                    date=ticket_data['match'].date,
-                    venue=ticket_data['venue'],
-                    ticket_category='General',
-                    quantity=ticket_data['quantity'],
-                    ticket_info='Test ticket'
-                )
-                db.session.add(ticket)
-            
-            db.session.commit()
+            # Plain dicts through one Core INSERT, sent to the driver as a single batch
+            db.session.execute(insert(Ticket), [
+                {
+                    'user_id': ticket_data['user'].id,
+                    'name': ticket_data['name'],
+                    'match_number': ticket_data['match'].match_number,
+                    'date': ticket_data['match'].date,
+                    'venue': ticket_data['venue'],
+                    'ticket_category': 'General',
+                    'quantity': ticket_data['quantity'],
+                    'ticket_info': 'Test ticket'
+                }
+                for ticket_data in test_tickets
+            ])
             print(f"✅ Created {len(test_tickets)} test tickets")
         else:
             print("⚠️  No users or matches found for test data")
+        
+        # Users and tickets land in one transaction
+        db.session.commit()
 
 def test_function_direct(llm_service, user_id, function_name, function_args=None):
     """Test a function directly"""
@@ -112,6 +127,10 @@ def test_function_direct(llm_service, user_id, function_name, function_args=None
 
 def run_direct_tests():
     """Run direct function tests"""
+    from app import app
+    from llm_service import LLMService
+    from models import User
+    
     print("🚀 Starting Direct Function Tests (Docker Environment)")
     print(f"⏰ Test started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"🗄️  Database: {os.environ.get('DATABASE_URL', 'SQLite (local)')}")
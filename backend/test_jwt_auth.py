@@ -1,149 +1,133 @@
 #!/usr/bin/env python3
 """Test script for JWT authentication flow"""
 import requests
-import json
 import sys
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 API_BASE_URL = 'http://localhost:8000'
 
+# Keep-alive sessions so requests after the first skip the TCP/TLS handshake. requests.Session
+# isn't thread-safe, so each thread (main and every pool worker) gets its own
+_local = threading.local()
+_sessions = []
+_sessions_lock = threading.Lock()
+
+
+def get_session():
+    """Return this thread's session, creating it on first use"""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+        session.headers['Content-Type'] = 'application/json'
+        with _sessions_lock:
+            _sessions.append(session)
+    return session
+
+
+def close_sessions():
+    """Close every thread's session"""
+    with _sessions_lock:
+        for session in _sessions:
+            session.close()
+        _sessions.clear()
+
+# Each case: (description, method, path, auth, send_credentials, expected_status, fields to print).
+# auth is 'token' for the token from the previous case, 'invalid' for a bogus one, or None.
+# Registration and login run in order - login's token feeds the rest.
+SETUP_CASES = [
+    ("Testing user registration", 'POST', '/api/auth/register', None, True, 201, ('id', 'username')),
+    ("Testing login", 'POST', '/api/auth/login', None, True, 200, ('id', 'username')),
+]
+# These only need the token and don't depend on each other, so they're sent together
+TOKEN_CASES = [
+    ("Testing protected endpoint access", 'GET', '/api/auth/me', 'token', False, 200, ('id', 'username')),
+    ("Testing protected endpoint without token", 'GET', '/api/auth/me', None, False, 401, ()),
+    ("Testing protected endpoint with invalid token", 'GET', '/api/auth/me', 'invalid', False, 401, ()),
+    ("Testing profile endpoint", 'GET', '/api/profile', 'token', False, 200, ('username',)),
+]
+
+
+def send_case(case, credentials, token):
+    """Send the request described by a case"""
+    _, method, path, auth, send_credentials, _, _ = case
+    headers = {}
+    if auth == 'token':
+        headers['Authorization'] = f'Bearer {token}'
+    elif auth == 'invalid':
+        headers['Authorization'] = 'Bearer invalid_token_12345'
+    return get_session().request(method, f'{API_BASE_URL}{path}', headers=headers,
+                                 json=credentials if send_credentials else None)
+
+
+def check_case(number, case, get_response):
+    """Print the outcome of a case; returns the response JSON on success, else None"""
+    description, _, _, _, _, expected_status, fields = case
+    print(f"\n{number}. {description}...")
+    try:
+        response = get_response()
+    except Exception as e:
+        print(f"   ❌ Error: {e}")
+        return None
+
+    if response.status_code != expected_status:
+        print(f"   ❌ Expected {expected_status}, got {response.status_code}")
+        print(f"   Response: {response.text}")
+        return None
+
+    if expected_status == 401:
+        print(f"   ✅ Correctly rejected with 401")
+        return {}
+
+    data = response.json()
+    print(f"   ✅ Success ({response.status_code})")
+    # Auth responses nest the user; /me and /profile return it directly
+    user = data.get('user', data)
+    for field in fields:
+        print(f"   {field}: {user.get(field)}")
+    if 'token' in data:
+        print(f"   Token received: {bool(data['token'])}")
+        if data['token']:
+            print(f"   Token preview: {data['token'][:50]}...")
+    return data
+
+
 def test_jwt_auth():
     """Test JWT authentication flow"""
     print("=" * 60)
     print("Testing JWT Authentication Flow")
     print("=" * 60)
-    
+
     # Use unique username with timestamp
-    unique_username = f'testuser_jwt_{int(time.time())}'
-    
-    # Test 1: Register a new user
-    print("\n1. Testing user registration...")
-    register_data = {
-        'username': unique_username,
-        'password': 'testpass123'
-    }
-    try:
-        response = requests.post(f'{API_BASE_URL}/api/auth/register', json=register_data)
-        if response.status_code == 201:
-            data = response.json()
-            token = data.get('token')
-            user = data.get('user')
-            print(f"   ✅ Registration successful")
-            if user:
-                print(f"   User ID: {user.get('id')}")
-                print(f"   Username: {user.get('username')}")
-            print(f"   Token received: {bool(token)}")
-            if token:
-                print(f"   Token preview: {token[:50]}...")
-        else:
-            print(f"   ❌ Registration failed: {response.status_code}")
-            print(f"   Response: {response.text}")
-            return False
-    except Exception as e:
-        print(f"   ❌ Registration error: {e}")
-        import traceback
-        print(f"   Traceback: {traceback.format_exc()}")
-        return False
-    
-    # Test 2: Login with credentials
-    print("\n2. Testing login...")
-    login_data = {
-        'username': unique_username,
+    credentials = {
+        'username': f'testuser_jwt_{int(time.time())}',
         'password': 'testpass123'
     }
-    try:
-        response = requests.post(f'{API_BASE_URL}/api/auth/login', json=login_data)
-        if response.status_code == 200:
-            data = response.json()
-            token = data.get('token')
-            user = data.get('user')
-            print(f"   ✅ Login successful")
-            print(f"   User ID: {user.get('id')}")
-            print(f"   Username: {user.get('username')}")
-            print(f"   Token received: {bool(token)}")
-            if token:
-                print(f"   Token preview: {token[:50]}...")
-        else:
-            print(f"   ❌ Login failed: {response.status_code}")
-            print(f"   Response: {response.text}")
-            return False
-    except Exception as e:
-        print(f"   ❌ Login error: {e}")
-        return False
-    
-    # Test 3: Access protected endpoint with token
-    print("\n3. Testing protected endpoint access...")
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json'
-    }
-    try:
-        response = requests.get(f'{API_BASE_URL}/api/auth/me', headers=headers)
-        if response.status_code == 200:
-            user_data = response.json()
-            print(f"   ✅ Protected endpoint access successful")
-            print(f"   User ID: {user_data.get('id')}")
-            print(f"   Username: {user_data.get('username')}")
-        else:
-            print(f"   ❌ Protected endpoint access failed: {response.status_code}")
-            print(f"   Response: {response.text}")
-            return False
-    except Exception as e:
-        print(f"   ❌ Protected endpoint error: {e}")
-        return False
-    
-    # Test 4: Access protected endpoint without token
-    print("\n4. Testing protected endpoint without token...")
-    try:
-        response = requests.get(f'{API_BASE_URL}/api/auth/me')
-        if response.status_code == 401:
-            print(f"   ✅ Correctly rejected request without token")
-        else:
-            print(f"   ❌ Should have returned 401, got {response.status_code}")
-            return False
-    except Exception as e:
-        print(f"   ❌ Error: {e}")
-        return False
-    
-    # Test 5: Access protected endpoint with invalid token
-    print("\n5. Testing protected endpoint with invalid token...")
-    invalid_headers = {
-        'Authorization': 'Bearer invalid_token_12345',
-        'Content-Type': 'application/json'
-    }
-    try:
-        response = requests.get(f'{API_BASE_URL}/api/auth/me', headers=invalid_headers)
-        if response.status_code == 401:
-            print(f"   ✅ Correctly rejected request with invalid token")
-        else:
-            print(f"   ❌ Should have returned 401, got {response.status_code}")
+
+    token = None
+    for number, case in enumerate(SETUP_CASES, 1):
+        data = check_case(number, case, lambda: send_case(case, credentials, token))
+        if data is None:
             return False
-    except Exception as e:
-        print(f"   ❌ Error: {e}")
-        return False
-    
-    # Test 6: Access profile endpoint
-    print("\n6. Testing profile endpoint...")
-    try:
-        response = requests.get(f'{API_BASE_URL}/api/profile', headers=headers)
-        if response.status_code == 200:
-            profile_data = response.json()
-            print(f"   ✅ Profile endpoint access successful")
-            print(f"   Username: {profile_data.get('username')}")
-        else:
-            print(f"   ❌ Profile endpoint access failed: {response.status_code}")
-            print(f"   Response: {response.text}")
+        token = data.get('token')
+
+    with ThreadPoolExecutor(max_workers=len(TOKEN_CASES)) as executor:
+        futures = [executor.submit(send_case, case, credentials, token) for case in TOKEN_CASES]
+
+    # Checked in order, stopping at the first failure as before
+    for number, (case, future) in enumerate(zip(TOKEN_CASES, futures), len(SETUP_CASES) + 1):
+        if check_case(number, case, future.result) is None:
             return False
-    except Exception as e:
-        print(f"   ❌ Profile endpoint error: {e}")
-        return False
-    
+
     print("\n" + "=" * 60)
     print("✅ All JWT authentication tests passed!")
     print("=" * 60)
     return True
 
 if __name__ == '__main__':
-    success = test_jwt_auth()
+    try:
+        success = test_jwt_auth()
+    finally:
+        close_sessions()
     sys.exit(0 if success else 1)
-